@@ -1,6 +1,4 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta
 import io
 import sys
@@ -8,8 +6,11 @@ import os
 
 # Add the parent directory to the path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from discount_engine import segment_customers, generate_discounts
-from utils import load_excel_data, create_charts
+from jobs import JobManager
+
+# Same file as store.DEFAULT_DB_PATH; kept here so checking for it on the
+# first render does not import the store and pandas
+STORE_PATH = 'discount_tool.db'
 
 # Page configuration
 st.set_page_config(
@@ -19,6 +20,53 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def get_job_manager():
+    """Job manager shared by every session on this server"""
+    return JobManager()
+
+@st.fragment(run_every=0.5)
+def show_job_progress(job_id, title="Processing"):
+    """Progress panel of a running job; only this panel reruns while polling"""
+    job = get_job_manager().get(job_id)
+    if job is None or job.finished:
+        # Collect the result with a full run of the page
+        st.rerun()
+    
+    st.subheader(f"⏳ {title}")
+    for stage, (done, total) in job.snapshot().items():
+        st.progress(done / total if total else 1.0, text=f"{stage.title()}: {done:,} / {total:,} rows")
+    if st.button(f"✖ Cancel {title.lower()}", key=f"cancel_{job_id}"):
+        job.cancel()
+
+def show_job_status():
+    """Show progress of this session's processing job and collect its result"""
+    manager = get_job_manager()
+    job = manager.get(st.session_state.job_id)
+    if job is None:
+        del st.session_state.job_id
+        return
+    
+    if not job.finished:
+        # Poll until the job finishes; other sessions are not blocked
+        show_job_progress(job.id)
+        return
+    
+    manager.forget(job.id)
+    del st.session_state.job_id
+    
+    if job.status == 'done':
+        st.session_state.df_processed, st.session_state.cost_curve = job.result
+        st.session_state.processed = True
+        st.rerun()
+    elif job.status == 'cancelled':
+        st.warning("Processing was cancelled.")
+    else:
+        st.error(f"Error during processing: {job.error.splitlines()[0]}")
+        st.error("Please check your data and try again. Make sure all required columns are present and contain valid data.")
+        with st.expander("Error details"):
+            st.code(job.error)
+
 def main():
     st.title("AI Restaurant Discount Generator")
     st.write("Upload your customer data and generate personalized discount campaigns.")
@@ -32,23 +80,35 @@ def main():
     # Sidebar for file upload and settings
     with st.sidebar:
         st.header("Upload Data")
-        uploaded_file = st.file_uploader(
-            "Upload Excel file with customer data",
+        uploaded_files = st.file_uploader(
+            "Upload Excel files with customer data",
             type=['xlsx', 'xls'],
-            help="Upload an Excel file containing customer data with columns like 'Customer Name', 'Phone', 'Total (₹)', etc."
+            accept_multiple_files=True,
+            help="Upload one or more Excel files containing customer data with columns like 'Customer Name', 'Phone', 'Total (₹)', etc. Customers with the same phone number are merged."
         )
         
-        if uploaded_file is not None:
+        if uploaded_files:
+            # Data modules pull in pandas and numpy; load them only once a
+            # file has been uploaded so the first render stays light
+            import pandas as pd
+            from discount_engine import segment_customers, generate_discounts
+            from utils import deduplicate_customers, load_excel_files
+            from store import CustomerStore
+            
             try:
-                # Load and process the uploaded file
-                df = load_excel_data(uploaded_file)
-                
-                # Store in session state
-                st.session_state.df = df
-                st.session_state.processed = False
+                # Load the uploaded files and merge customers by phone, only
+                # when the selection changes rather than on every rerun. The
+                # per-outlet rows keep each invoice with its outlet for the store.
+                upload_key = tuple((f.name, f.size) for f in uploaded_files)
+                if st.session_state.get('upload_key') != upload_key:
+                    st.session_state.df_by_outlet = load_excel_files(uploaded_files, by_outlet=True)
+                    st.session_state.df = deduplicate_customers(st.session_state.df_by_outlet)
+                    st.session_state.upload_key = upload_key
+                    st.session_state.processed = False
+                df = st.session_state.df
                 
                 # Show data summary
-                st.success("File uploaded successfully!")
+                st.success(f"{len(uploaded_files)} file(s) uploaded successfully!")
                 st.info(f"📊 Found {len(df)} customers")
                 
                 try:
@@ -57,6 +117,11 @@ def main():
                 except Exception as e:
                     st.error(f"Error calculating metrics: {str(e)}")
                 
+                if st.button("💾 Save to customer store"):
+                    with CustomerStore(STORE_PATH) as store:
+                        count = store.upsert_customers(st.session_state.df_by_outlet)
+                    st.success(f"Saved {count} customers to {STORE_PATH}")
+                
                 # Add test processing button
                 if st.button("🔧 TEST: Process Sample Data"):
                     try:
@@ -82,7 +147,7 @@ def main():
                         # Process the test data
                         with st.spinner("Processing test data..."):
                             st.sidebar.write("🔍 Testing segmentation...")
-                            segmented = segment_customers(test_df.copy())
+                            segmented = segment_customers(test_df)
                             st.sidebar.success("✅ Segmentation successful")
                             
                             st.sidebar.write("💰 Generating discounts...")
@@ -91,6 +156,7 @@ def main():
                             
                             # Store results
                             st.session_state.df_processed = processed
+                            st.session_state.cost_curve = None
                             st.session_state.processed = True
                             st.sidebar.success("✅ Results stored")
                             
@@ -100,63 +166,42 @@ def main():
                     except Exception as e:
                         st.sidebar.error(f"❌ Test failed: {str(e)}")
                         st.sidebar.exception(e)
-                
-                # Original processing button
-                if st.button("🚀 Process Data & Generate Discounts"):
-                    import time
-                    from datetime import datetime
-                    
-                    def log_debug(message):
-                        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-                        st.sidebar.text(f"{timestamp} - {message}")
-                    
-                    with st.spinner("Processing data and generating recommendations..."):
-                        try:
-                            log_debug("1. Starting data processing...")
-                            log_debug(f"2. DataFrame shape: {df.shape}")
-                            log_debug(f"3. DataFrame columns: {df.columns.tolist()}")
-                            log_debug(f"4. First row data: {df.iloc[0].to_dict() if len(df) > 0 else 'Empty DataFrame'}")
-                            
-                            # Apply segmentation
-                            log_debug("5. Starting customer segmentation...")
-                            start_time = time.time()
-                            df_segmented = segment_customers(df.copy())
-                            log_debug(f"6. Segmentation completed in {time.time() - start_time:.2f} seconds")
-                            log_debug(f"7. Segmented DataFrame shape: {df_segmented.shape}")
-                            
-                            # Check if 'segment' column was added
-                            if 'segment' not in df_segmented.columns:
-                                raise ValueError("Segmentation failed: 'segment' column not found in the output")
-                            
-                            # Generate discounts
-                            log_debug("8. Starting discount generation...")
-                            start_time = time.time()
-                            df_with_discounts = generate_discounts(df_segmented)
-                            log_debug(f"9. Discount generation completed in {time.time() - start_time:.2f} seconds")
-                            
-                            # Store results in session state
-                            st.session_state.df_processed = df_with_discounts
-                            st.session_state.processed = True
-                            log_debug("10. Results stored in session state")
-                            
-                            # Force a rerun to update the UI
-                            log_debug("11. Triggering UI update...")
-                            st.rerun()
-                            
-                        except Exception as e:
-                            log_debug(f"ERROR: {str(e)}")
-                            st.error(f"Error during processing: {str(e)}")
-                            st.error("Please check your data and try again. Make sure all required columns are present and contain valid data.")
-                            
-                            # Show detailed error information
-                            error_trace = traceback.format_exc()
-                            log_debug("Full error trace:")
-                            for line in error_trace.split('\n'):
-                                log_debug(line)
             
             except Exception as e:
                 st.error(f"Error processing file: {str(e)}")
                 st.error("Please check your file format and try again.")
+        
+        elif os.path.exists(STORE_PATH):
+            # Offer customers saved from earlier sessions
+            from store import CustomerStore
+            
+            with CustomerStore(STORE_PATH) as store:
+                st.caption(f"🗄️ {store.customer_count()} customers in the local store")
+                if st.button("📂 Load customers from store"):
+                    st.session_state.df = store.load_customers()
+                    st.session_state.processed = False
+                with st.expander("Segments and campaign history"):
+                    st.dataframe(store.segment_counts(), use_container_width=True)
+                    st.dataframe(store.campaign_history().head(100), use_container_width=True)
+        
+        # Uploaded and store-loaded customers are processed the same way
+        if st.session_state.df is not None:
+            from discount_engine import process_customers
+            
+            campaign_budget = st.number_input(
+                "Campaign budget (₹)",
+                min_value=0.0,
+                value=0.0,
+                step=1000.0,
+                help="Optimize discount levels to stay within this budget. Leave at 0 for no cap."
+            )
+            
+            # Process in the background so the session stays responsive
+            if st.button("🚀 Process Data & Generate Discounts", disabled='job_id' in st.session_state):
+                st.session_state.job_id = get_job_manager().submit(
+                    process_customers, st.session_state.df, budget=campaign_budget or None
+                )
+                st.rerun()
     
     # Main content area
     if st.session_state.df is not None:
@@ -172,49 +217,63 @@ def main():
             with col3:
                 st.metric("Average Spend", f"₹{st.session_state.df['total_spent'].mean():,.2f}")
             
-            # Create tabs for different views
-            tab1, tab2 = st.tabs(["📊 Data Preview", "🎯 Discounts (After Processing)"])
+        # Create tabs for different views
+        tab1, tab2, tab3 = st.tabs(["📊 Data Preview", "🎯 Discounts (After Processing)", "📅 Cohorts"])
+        
+        with tab1:
+            # Show data preview in the first tab
+            st.dataframe(
+                st.session_state.df[['customer_name', 'phone', 'total_spent', 'total_orders', 'last_order_date']].head(10),
+                use_container_width=True
+            )
             
-            with tab1:
-                # Show data preview in the first tab
-                st.dataframe(
-                    st.session_state.df[['customer_name', 'phone', 'total_spent', 'total_orders', 'last_order_date']].head(10),
-                    use_container_width=True
-                )
-                
+            if not st.session_state.processed:
                 st.info("💡 Click 'Process Data & Generate Discounts' in the sidebar to analyze your customers and create personalized discount campaigns.")
-                
-                # Show basic stats
-                st.subheader("📈 Quick Stats")
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Total Customers", len(st.session_state.df))
-                with col2:
-                    st.metric("Total Revenue", f"₹{st.session_state.df['total_spent'].sum():,.2f}")
-                with col3:
-                    st.metric("Avg. Order Value", f"₹{st.session_state.df['total_spent'].mean():.2f}")
-                
-            # Initialize the second tab (will be empty until processing is done)
-            with tab2:
-                st.info("Process your data first to see discount recommendations here.")
+            
+            # Show basic stats
+            st.subheader("📈 Quick Stats")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Customers", len(st.session_state.df))
+            with col2:
+                st.metric("Total Revenue", f"₹{st.session_state.df['total_spent'].sum():,.2f}")
+            with col3:
+                st.metric("Avg. Order Value", f"₹{st.session_state.df['total_spent'].mean():.2f}")
         
         # Show processed results in the second tab if available
-        if 'df_processed' in st.session_state and st.session_state.processed:
-            with tab2:
+        with tab2:
+            if 'df_processed' in st.session_state and st.session_state.processed:
                 display_results(st.session_state.df_processed)
+            else:
+                st.info("Process your data first to see discount recommendations here.")
+        
+        # Retention is built from invoice history, so it needs no processing
+        with tab3:
+            display_cohorts(st.session_state.df)
     
     # If processing is complete, show results in the second tab
     elif 'df_processed' in st.session_state and st.session_state.processed:
-        tab1, tab2 = st.tabs(["📊 Data Preview", "🎯 Discounts (After Processing)"])
+        tab1, tab2, tab3 = st.tabs(["📊 Data Preview", "🎯 Discounts (After Processing)", "📅 Cohorts"])
         with tab1:
             st.info("Upload a file to see the data preview.")
         with tab2:
             display_results(st.session_state.df_processed)
+        with tab3:
+            display_cohorts(st.session_state.df_processed)
     else:
         st.info("📤 Please upload a file to get started.")
+    
+    # Track this session's processing job once the page has rendered
+    if 'job_id' in st.session_state:
+        with st.sidebar:
+            show_job_status()
 
 def display_results(df):
     """Display the processed results and visualizations"""
+    import pandas as pd
+    import plotly.express as px
+    from store import CustomerStore
+    
     st.subheader("🎯 Campaign Summary")
     
     # Calculate metrics
@@ -240,6 +299,19 @@ def display_results(df):
     fig = px.pie(df, names='segment', title='Customer Segment Distribution')
     st.plotly_chart(fig, use_container_width=True)
     
+    # Show the marginal cost curve when discounts were budget-optimized
+    if st.session_state.get('cost_curve') is not None:
+        st.subheader("📉 Budget Curve")
+        fig = px.line(
+            st.session_state.cost_curve,
+            x='campaign_cost',
+            y='expected_value',
+            color='within_budget',
+            title='Expected Value vs Campaign Cost',
+            labels={'campaign_cost': 'Campaign Cost (₹)', 'expected_value': 'Expected Value (₹)'}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    
     # Show segment-wise statistics
     st.subheader("📈 Segment Analysis")
     segment_stats = df.groupby('segment').agg({
@@ -290,6 +362,11 @@ def display_results(df):
         # Add segment analysis sheet
         segment_stats.to_excel(writer, sheet_name='Segment_Analysis')
     
+    if st.button("📝 Record campaign in customer store"):
+        with CustomerStore(STORE_PATH) as store:
+            count = store.record_discounts(df)
+        st.success(f"Recorded {count} discounts in {STORE_PATH}")
+    
     st.download_button(
         label="📥 Download Recommendations",
         data=output.getvalue(),
@@ -297,5 +374,87 @@ def display_results(df):
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
+def display_cohorts(df):
+    """Display cohort retention and inter-purchase gaps from invoice history"""
+    import plotly.express as px
+    from cohorts import cohort_analysis
+    
+    if 'invoice' not in df.columns:
+        st.info("Cohort analysis needs the Invoice column with invoice dates.")
+        return
+    
+    # Parsing every invoice takes seconds on large exports, so it runs as a
+    # background job on request and the result is reused across reruns
+    cached = st.session_state.get('cohorts')
+    if cached is None or cached[0] is not df:
+        manager = get_job_manager()
+        job_df, job_id = st.session_state.get('cohort_job', (None, None))
+        job = manager.get(job_id)
+        if job is not None and job_df is not df:
+            # Built for data that has since been replaced
+            job.cancel()
+            job = None
+        
+        if job is None:
+            st.session_state.pop('cohort_job', None)
+            if st.button("📅 Build cohort analysis"):
+                st.session_state.cohort_job = (df, manager.submit(cohort_analysis, df))
+                st.rerun()
+            return
+        
+        if not job.finished:
+            show_job_progress(job.id, "Building cohorts")
+            return
+        
+        manager.forget(job.id)
+        del st.session_state.cohort_job
+        if job.status == 'cancelled':
+            st.warning("Cohort analysis was cancelled.")
+            return
+        if job.status != 'done':
+            st.error(f"Error building cohorts: {job.error.splitlines()[0]}")
+            with st.expander("Error details"):
+                st.code(job.error)
+            return
+        cached = (df, job.result)
+        st.session_state.cohorts = cached
+    analysis = cached[1]
+    
+    retention = analysis['retention']
+    if retention.empty:
+        st.info("No dated invoices found to build cohorts from.")
+        return
+    
+    st.subheader("📅 Monthly Retention by First Order")
+    fig = px.imshow(
+        retention.drop(columns='cohort_size') * 100,
+        text_auto='.0f',
+        aspect='auto',
+        color_continuous_scale='Blues',
+        labels={'x': 'Months Since First Order', 'y': 'First Order Month', 'color': 'Active %'}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(analysis['retention_counts'], use_container_width=True)
+    
+    st.subheader("⏱️ Days Between Orders")
+    percentiles = analysis['gap_percentiles']
+    if percentiles:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Median Gap", f"{percentiles['p50']:.0f} days")
+        with col2:
+            st.metric("75% Reorder Within", f"{percentiles['p75']:.0f} days")
+        with col3:
+            st.metric("90% Reorder Within", f"{percentiles['p90']:.0f} days")
+    fig = px.bar(
+        analysis['gaps'],
+        x='gap_days',
+        y='orders',
+        hover_data=['cumulative_share'],
+        title='Repeat Orders by Days Since Previous Order',
+        labels={'gap_days': 'Days Since Previous Order', 'orders': 'Repeat Orders'}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
 if __name__ == "__main__":
     main()
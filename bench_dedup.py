@@ -0,0 +1,50 @@
+"""
+Measure deduplicate_customers on one phone number shared by many rows.
+
+Walk-in and counter sales often carry the same placeholder number, so one
+customer can collect tens of thousands of rows. Merging them should grow
+linearly with the group size; a quadratic text join shows up here as a
+time per row that climbs with n.
+
+Usage:
+    python bench_dedup.py [--runs N] [--sizes N ...]
+"""
+import argparse
+import statistics
+import time
+
+import pandas as pd
+
+from utils import deduplicate_customers
+
+def shared_phone_frame(n):
+    """n rows that all belong to the same phone number"""
+    return pd.DataFrame({
+        'customer_name': ['Walk-in'] * n,
+        'phone': ['9999999999'] * n,
+        'total_spent': [100.0] * n,
+        'total_orders': [1] * n,
+        'invoice': [f'Invoice ID: {i}(Rs.100 - 2025-05-01 12:00:00)' for i in range(n)]
+    })
+
+def measure(df, runs):
+    """Return the median seconds of deduplicate_customers over several runs"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        deduplicate_customers(df)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 80000, 320000])
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        elapsed = measure(shared_phone_frame(n), args.runs)
+        print(f"{n:>9,} rows:  {elapsed * 1000:8.1f} ms  ({elapsed / n * 1e6:.2f} µs/row)")
+
+if __name__ == "__main__":
+    main()
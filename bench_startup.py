@@ -0,0 +1,73 @@
+"""
+Measure the cold first render of the app.
+
+Each measurement runs in a fresh interpreter. Streamlit is imported first,
+as it already is in a running server, and the timer then covers a full
+first run of app.py with streamlit.testing's AppTest: from the start of
+the script until the uploader has been handled with no file selected.
+The heavy modules it still loads on that path are listed; what is left is
+paid on the first upload and is measured separately.
+
+Usage:
+    python bench_startup.py [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ['pandas', 'numpy', 'plotly.express', 'openpyxl']
+UPLOAD_MODULES = ['discount_engine', 'utils', 'store']
+
+FIRST_RUN_PROBE = """
+import sys, time
+import streamlit
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('app.py', default_timeout=60)
+start = time.perf_counter()
+app.run()
+elapsed = time.perf_counter() - start
+assert not app.exception, app.exception
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, ','.join(loaded))
+"""
+
+IMPORT_PROBE = """
+import sys, time
+import streamlit
+start = time.perf_counter()
+import {modules}
+print(time.perf_counter() - start)
+"""
+
+def measure(probe, runs):
+    """Return (median seconds, remaining output of the last run) for a probe script"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    extra = ''
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', probe],
+            cwd=here,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.split()
+        timings.append(float(output[0]))
+        extra = output[1] if len(output) > 1 else ''
+    return statistics.median(timings), extra
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    first_run, loaded = measure(FIRST_RUN_PROBE.format(heavy=HEAVY_MODULES), args.runs)
+    on_upload, _ = measure(IMPORT_PROBE.format(modules=', '.join(UPLOAD_MODULES)), args.runs)
+
+    print(f"first render (no upload):   {first_run * 1000:8.1f} ms  (heavy modules loaded: {loaded or 'none'})")
+    print(f"paid on first upload:       {on_upload * 1000:8.1f} ms  (import {', '.join(UPLOAD_MODULES)})")
+
+if __name__ == "__main__":
+    main()
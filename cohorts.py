@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from utils import extract_invoice_events
+
+def _months(dates):
+    """Months since 1970-01 for an array of datetimes"""
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+def _cohort_counts(events: pd.DataFrame) -> pd.DataFrame:
+    """Active customers per cohort month and month offset, plus cohort_size"""
+    events = events.dropna(subset=['invoice_date'])
+    if events.empty:
+        return pd.DataFrame(columns=['cohort_size'])
+
+    customer, _ = pd.factorize(events['customer'])
+    month = _months(events['invoice_date'])
+    base = month.min()
+    n_months = month.max() - base + 1
+
+    # Count each customer once per active month (sort and drop repeats,
+    # which is cheaper than np.unique's hashing for dense integer keys)
+    active = np.sort(customer * n_months + (month - base))
+    active = active[np.r_[True, active[1:] != active[:-1]]]
+    active_customer = active // n_months
+    active_month = active % n_months
+
+    # Keys are sorted by customer, then month, so each customer's first
+    # active month is the first key of their run
+    first_key = np.r_[True, active_customer[1:] != active_customer[:-1]]
+    first = active_month[first_key][np.cumsum(first_key) - 1]
+
+    offset = active_month - first
+    counts = np.bincount(first * n_months + offset, minlength=n_months * n_months).reshape(n_months, n_months)
+
+    cohort_size = counts[:, 0]
+    keep = cohort_size > 0
+    labels = (np.arange(n_months)[keep] + base).astype('datetime64[M]').astype(str)
+    matrix = pd.DataFrame(
+        counts[keep],
+        index=pd.Index(labels, name='cohort'),
+        columns=pd.RangeIndex(n_months, name='months_since_first_order')
+    )
+
+    # Offsets past the end of the data are unknown rather than zero
+    max_offset = n_months - 1 - np.arange(n_months)[keep]
+    matrix = matrix.where(np.arange(n_months)[None, :] <= max_offset[:, None])
+    matrix.insert(0, 'cohort_size', cohort_size[keep])
+    return matrix
+
+def _shares(counts: pd.DataFrame) -> pd.DataFrame:
+    """Turn cohort counts into the share of each cohort active per month"""
+    shares = counts.drop(columns='cohort_size').div(counts['cohort_size'], axis=0)
+    shares.insert(0, 'cohort_size', counts['cohort_size'])
+    return shares
+
+def retention_matrix(events: pd.DataFrame, normalize: bool = True) -> pd.DataFrame:
+    """
+    First-order-month x months-since-first-order retention matrix.
+
+    Args:
+        events: Output of extract_invoice_events (customer and invoice_date)
+        normalize: Return the share of each cohort active in a month instead
+            of the number of customers
+
+    Returns:
+        pd.DataFrame: One row per cohort month ('YYYY-MM'), one column per
+        month offset, plus a cohort_size column
+    """
+    counts = _cohort_counts(events)
+    return _shares(counts) if normalize else counts
+
+def interpurchase_gaps(events: pd.DataFrame) -> np.ndarray:
+    """
+    Days between consecutive orders of the same customer.
+
+    Args:
+        events: Output of extract_invoice_events (customer and invoice_date)
+
+    Returns:
+        np.ndarray: One gap in days per repeat order
+    """
+    events = events.dropna(subset=['invoice_date'])
+    customer = events['customer'].to_numpy()
+    dates = np.asarray(events['invoice_date'], dtype='datetime64[ns]')
+
+    order = np.lexsort((dates, customer))
+    customer = customer[order]
+    dates = dates[order]
+
+    same_customer = customer[1:] == customer[:-1]
+    gaps = (dates[1:] - dates[:-1])[same_customer]
+    return gaps / np.timedelta64(1, 'D')
+
+def gap_distribution(gaps: np.ndarray, max_days: int = 90) -> pd.DataFrame:
+    """
+    Histogram of inter-purchase gaps in whole days.
+
+    Args:
+        gaps: Output of interpurchase_gaps
+        max_days: Gaps longer than this are counted in the last bucket
+
+    Returns:
+        pd.DataFrame: gap_days, orders and cumulative_share of repeat orders
+        placed within that many days
+    """
+    days = np.minimum(np.floor(gaps).astype(np.int64), max_days)
+    counts = np.bincount(days, minlength=max_days + 1)
+    total = counts.sum()
+    return pd.DataFrame({
+        'gap_days': np.arange(max_days + 1),
+        'orders': counts,
+        'cumulative_share': np.cumsum(counts) / total if total else np.zeros(max_days + 1)
+    })
+
+def cohort_analysis(df: pd.DataFrame, max_days: int = 90, progress=None) -> dict:
+    """
+    Parse invoice timestamps and build all cohort views in one pass.
+
+    Args:
+        df: Customer data with an invoice column (see load_excel_data)
+        max_days: Cap for the gap histogram
+        progress (callable, optional): Called as progress(stage, rows_done, total_rows)
+
+    Returns:
+        dict: retention (shares), retention_counts, gaps (histogram) and
+        gap_percentiles (median, p75 and p90 gap in days)
+    """
+    report = progress or (lambda stage, done, total_rows: None)
+
+    report('invoices', 0, len(df))
+    events = extract_invoice_events(df)
+    report('invoices', len(df), len(df))
+
+    report('cohorts', 0, len(events))
+    gaps = interpurchase_gaps(events)
+    counts = _cohort_counts(events)
+    report('cohorts', len(events), len(events))
+    return {
+        'retention': _shares(counts),
+        'retention_counts': counts,
+        'gaps': gap_distribution(gaps, max_days),
+        'gap_percentiles': dict(zip(['p50', 'p75', 'p90'], np.percentile(gaps, [50, 75, 90]))) if len(gaps) else {}
+    }
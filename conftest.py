@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def make_customers():
+    """
+    Factory for seeded random customer frames.
+
+    make_customers(n, seed, orders=(low, high), days=(low, high)) returns
+    customer_name, total_orders, total_spent and last_order_date columns,
+    with order counts and days before as_of drawn from the half-open
+    ranges. Pass outlets or segments to add a column drawn from that list.
+    """
+    def make(n=1000, seed=0, orders=(0, 15), days=(0, 60), as_of=datetime(2025, 6, 23), outlets=None, segments=None):
+        rng = np.random.default_rng(seed)
+        df = pd.DataFrame({
+            'customer_name': [f'Customer {i}' for i in range(n)],
+            'total_orders': rng.integers(*orders, size=n),
+            'total_spent': rng.gamma(2, 1500, size=n).round(),
+            'last_order_date': [as_of - timedelta(days=int(d)) for d in rng.integers(*days, size=n)]
+        })
+        if outlets is not None:
+            df['outlet'] = rng.choice(outlets, size=n)
+        if segments is not None:
+            df['segment'] = rng.choice(segments, size=n)
+        return df
+    return make
@@ -1,25 +1,82 @@
+import logging
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
-def segment_customers(df):
+logger = logging.getLogger(__name__)
+
+# Discount rules by segment
+DISCOUNT_RULES = {
+    'VIP': {
+        'base_discount': 25,
+        'max_discount': 40,
+        'min_order_value': 500,
+        'validity_days': 30,
+        'campaign_type': 'VIP Exclusive'
+    },
+    'Regular': {
+        'base_discount': 20,
+        'max_discount': 30,
+        'min_order_value': 400,
+        'validity_days': 21,
+        'campaign_type': 'Loyalty Reward'
+    },
+    'Occasional': {
+        'base_discount': 15,
+        'max_discount': 25,
+        'min_order_value': 300,
+        'validity_days': 14,
+        'campaign_type': 'Comeback Offer'
+    },
+    'Lapsed': {
+        'base_discount': 30,
+        'max_discount': 50,
+        'min_order_value': 200,
+        'validity_days': 45,
+        'campaign_type': 'We Miss You!'
+    },
+    'New': {
+        'base_discount': 20,
+        'max_discount': 35,
+        'min_order_value': 200,
+        'validity_days': 30,
+        'campaign_type': 'Welcome Offer'
+    }
+}
+
+# Segmentation thresholds (₹ for spend, days for recency)
+SEGMENT_THRESHOLDS = {
+    'vip_spent': 5000,
+    'vip_orders': 10,
+    'vip_orders_spent': 2000,
+    'regular_spent': 2000,
+    'regular_orders': 5,
+    'regular_orders_spent': 1000,
+    'occasional_spent': 500,
+    'lapsed_days': 14,
+    'new_spent': 500,
+    'new_orders': 2
+}
+
+# Segment labels, indexed by the codes returned from assign_segments
+SEGMENTS = ('VIP', 'Regular', 'Occasional', 'Lapsed', 'New')
+
+def feature_columns(df, as_of=None):
     """
-    Segment customers based on their order history and spending patterns.
+    Map, coerce and fill the columns segmentation depends on.
+    
+    The input is only read; nothing in it is copied or modified.
     
     Args:
         df (pd.DataFrame): Input DataFrame with customer data
+        as_of (datetime, optional): Reference date for recency (defaults to now)
         
     Returns:
-        pd.DataFrame: DataFrame with an additional 'segment' column
+        dict: Standardized total_orders, total_spent, last_order_date and
+        days_since_last_order columns as Series aligned to df
     """
-    import streamlit as st
-    
-    # Make a copy to avoid modifying the original DataFrame
-    df = df.copy()
-    
     # Debug: Show input DataFrame info
-    st.write("Debug - Input DataFrame columns:", df.columns.tolist())
-    st.write("Debug - First row of data:", df.iloc[0].to_dict())
+    logger.debug("Input DataFrame columns: %s", df.columns.tolist())
     
     # Ensure required columns exist (case-insensitive)
     required_columns = {
@@ -40,83 +97,185 @@ def segment_customers(df):
     missing_columns = [col for col in required_columns if col not in column_mapping]
     if missing_columns:
         error_msg = f"Could not find required columns: {', '.join(missing_columns)}. Available columns: {df.columns.tolist()}"
-        st.error(error_msg)
         raise ValueError(error_msg)
     
     # Debug: Show column mapping
-    st.write("Debug - Column mapping:", column_mapping)
+    logger.debug("Column mapping: %s", column_mapping)
     
     # Standardize column names
-    for std_name, orig_name in column_mapping.items():
-        if std_name != orig_name:
-            df[std_name] = df[orig_name]
-            st.write(f"Debug - Mapped column '{orig_name}' to standard name '{std_name}'")
+    columns = {std_name: df[orig_name] for std_name, orig_name in column_mapping.items()}
     
     # Convert data types if needed
-    if not pd.api.types.is_numeric_dtype(df['total_orders']):
-        df['total_orders'] = pd.to_numeric(df['total_orders'], errors='coerce')
+    if not pd.api.types.is_numeric_dtype(columns['total_orders']):
+        columns['total_orders'] = pd.to_numeric(columns['total_orders'], errors='coerce')
     
-    if not pd.api.types.is_numeric_dtype(df['total_spent']):
-        df['total_spent'] = pd.to_numeric(
-            df['total_spent'].astype(str).str.replace(r'[^\d.]', '', regex=True),
+    if not pd.api.types.is_numeric_dtype(columns['total_spent']):
+        columns['total_spent'] = pd.to_numeric(
+            columns['total_spent'].astype(str).str.replace(r'[^\d.]', '', regex=True),
             errors='coerce'
         )
     
-    if not pd.api.types.is_datetime64_any_dtype(df['last_order_date']):
-        df['last_order_date'] = pd.to_datetime(df['last_order_date'], errors='coerce')
+    if not pd.api.types.is_datetime64_any_dtype(columns['last_order_date']):
+        columns['last_order_date'] = pd.to_datetime(columns['last_order_date'], errors='coerce')
     
     # Fill missing values with defaults
-    df['total_orders'] = df['total_orders'].fillna(1)
-    df['total_spent'] = df['total_spent'].fillna(0)
-    df['last_order_date'] = df['last_order_date'].fillna(datetime.now())
+    current_date = as_of or datetime.now()
+    columns['total_orders'] = columns['total_orders'].fillna(1)
+    columns['total_spent'] = columns['total_spent'].fillna(0)
+    columns['last_order_date'] = columns['last_order_date'].fillna(current_date)
     
     # Calculate days since last order
-    current_date = datetime.now()
-    df['days_since_last_order'] = (current_date - df['last_order_date']).dt.days
+    columns['days_since_last_order'] = (current_date - columns['last_order_date']).dt.days
     
-    # Initialize segment column
-    df['segment'] = 'New'  # Default segment
+    return columns
+
+def assemble(df, *column_sets):
+    """
+    Combine a stage's input with the columns one or more stages produced.
+    
+    Stages return only the columns they add or replace. The result shares
+    the input's column data (a shallow copy), so the input is neither copied
+    nor modified and only the new columns take extra memory.
+    
+    Args:
+        df (pd.DataFrame): Stage input
+        *column_sets (dict): Column name -> values, each the length of df
+        
+    Returns:
+        pd.DataFrame: Input columns followed by new columns; replaced
+        columns keep their position
+    """
+    out = df.copy(deep=False)
+    for columns in column_sets:
+        for name, values in columns.items():
+            # Assign positionally; the values already line up with df's rows
+            out[name] = values.array if isinstance(values, pd.Series) else values
+    return out
+
+def assign_segments(spent, orders, days, thresholds=SEGMENT_THRESHOLDS):
+    """
+    Apply the segmentation rules to feature arrays.
+    
+    Args:
+        spent (np.ndarray): Total spend per customer
+        orders (np.ndarray): Order count per customer
+        days (np.ndarray): Days since each customer's last order
+        thresholds (dict): Rule cutoffs, see SEGMENT_THRESHOLDS
+        
+    Returns:
+        np.ndarray: Segment code per customer, indexing into SEGMENTS
+    """
+    t = thresholds
     
-    # Apply segmentation rules based on spending and order patterns
     # VIP: High spenders (₹5000+) or frequent customers (10+ orders with good spend)
-    vip_mask = (
-        (df['total_spent'] >= 5000) | 
-        ((df['total_orders'] >= 10) & (df['total_spent'] >= 2000))
-    )
-    df.loc[vip_mask, 'segment'] = 'VIP'
+    vip = (spent >= t['vip_spent']) | ((orders >= t['vip_orders']) & (spent >= t['vip_orders_spent']))
     
     # Regular: Medium spenders (₹2000+) or moderate customers (5+ orders with decent spend)
-    regular_mask = (
-        (~vip_mask) & 
-        ((df['total_spent'] >= 2000) | 
-         ((df['total_orders'] >= 5) & (df['total_spent'] >= 1000)))
+    regular = ~vip & (
+        (spent >= t['regular_spent']) |
+        ((orders >= t['regular_orders']) & (spent >= t['regular_orders_spent']))
     )
-    df.loc[regular_mask, 'segment'] = 'Regular'
     
     # Occasional: Low to medium spenders (₹500+) or occasional customers
-    occasional_mask = (
-        (~vip_mask & ~regular_mask) & 
-        (df['total_spent'] >= 500)
-    )
-    df.loc[occasional_mask, 'segment'] = 'Occasional'
+    occasional = ~vip & ~regular & (spent >= t['occasional_spent'])
     
     # Lapsed: No orders in 14+ days (only for customers with some history)
-    lapsed_mask = (
-        (df['days_since_last_order'] >= 14) & 
-        (df['total_orders'] > 0) & 
-        (df['total_spent'] > 0)
-    )
-    df.loc[lapsed_mask, 'segment'] = 'Lapsed'
+    lapsed = (days >= t['lapsed_days']) & (orders > 0) & (spent > 0)
     
     # New: Everyone else (low spend, few orders, recent activity)
-    new_mask = (
-        (df['total_spent'] < 500) & 
-        (df['total_orders'] <= 2) & 
-        (df['days_since_last_order'] < 14)
+    new = (spent < t['new_spent']) & (orders <= t['new_orders']) & (days < t['lapsed_days'])
+    
+    # Later rules override earlier ones, so check them first
+    return np.select(
+        [new, lapsed, occasional, regular, vip],
+        [SEGMENTS.index(s) for s in ('New', 'Lapsed', 'Occasional', 'Regular', 'VIP')],
+        default=SEGMENTS.index('New')
     )
-    df.loc[new_mask, 'segment'] = 'New'
+
+def segment_columns(df, as_of=None):
+    """
+    Segmentation stage: the standardized feature columns plus 'segment'.
+    
+    Args:
+        df (pd.DataFrame): Input DataFrame with customer data
+        as_of (datetime, optional): Reference date for recency (defaults to now)
+        
+    Returns:
+        dict: Columns to add to df
+    """
+    columns = feature_columns(df, as_of)
+    
+    codes = assign_segments(
+        columns['total_spent'].to_numpy(dtype=float),
+        columns['total_orders'].to_numpy(dtype=float),
+        columns['days_since_last_order'].to_numpy(dtype=float)
+    )
+    columns['segment'] = np.array(SEGMENTS, dtype=object)[codes]
+    
+    return columns
+
+def segment_customers(df, as_of=None):
+    """
+    Segment customers based on their order history and spending patterns.
+    
+    Args:
+        df (pd.DataFrame): Input DataFrame with customer data
+        as_of (datetime, optional): Reference date for recency (defaults to now)
+        
+    Returns:
+        pd.DataFrame: DataFrame with an additional 'segment' column
+    """
+    return assemble(df, segment_columns(df, as_of))
+
+def compute_discounts(codes, spent, rules=DISCOUNT_RULES):
+    """
+    Look up discount parameters for segment codes.
+    
+    Args:
+        codes (np.ndarray): Segment codes indexing into SEGMENTS (-1 = unknown)
+        spent (np.ndarray): Total spend per customer
+        rules (dict): Discount rules by segment, see DISCOUNT_RULES
+        
+    Returns:
+        dict: Arrays for discount_pct, min_order_value, validity_days and campaign_type
+    """
+    # One slot per segment plus a trailing slot for unknown segments (code -1)
+    def lookup(key, default, dtype):
+        values = [rules[s][key] if s in rules else default for s in SEGMENTS] + [default]
+        return np.array(values, dtype=dtype)[codes]
+    
+    discount = lookup('base_discount', 0, float)
     
-    return df
+    # Higher spenders get higher discounts (capped at max_discount)
+    personalized = np.isin(codes, [SEGMENTS.index('VIP'), SEGMENTS.index('Regular')])
+    bumped = np.minimum(discount + np.trunc(spent / 1000), lookup('max_discount', 0, float))
+    discount = np.where(personalized, bumped, discount)
+    
+    # Ensure discount doesn't exceed 50% and maintains at least 15% margin
+    return {
+        'discount_pct': np.minimum(discount, 50),
+        'min_order_value': lookup('min_order_value', 0, float),
+        'validity_days': lookup('validity_days', 0, np.int64),
+        'campaign_type': lookup('campaign_type', '', object)
+    }
+
+def discount_columns(df):
+    """
+    Discount stage: discount parameters and a message for each customer.
+    
+    Args:
+        df (pd.DataFrame): DataFrame with customer data and segments
+        
+    Returns:
+        dict: Columns to add to df
+    """
+    codes = pd.Categorical(df['segment'], categories=SEGMENTS).codes
+    columns = compute_discounts(codes, df['total_spent'].to_numpy(dtype=float))
+    
+    # Add a personalized message
+    columns['message'] = build_messages(assemble(df, columns))
+    
+    return columns
 
 def generate_discounts(df):
     """
@@ -128,94 +287,184 @@ def generate_discounts(df):
     Returns:
         pd.DataFrame: DataFrame with discount recommendations
     """
-    # Define discount rules by segment
-    discount_rules = {
-        'VIP': {
-            'base_discount': 25,
-            'max_discount': 40,
-            'min_order_value': 500,
-            'validity_days': 30,
-            'campaign_type': 'VIP Exclusive'
-        },
-        'Regular': {
-            'base_discount': 20,
-            'max_discount': 30,
-            'min_order_value': 400,
-            'validity_days': 21,
-            'campaign_type': 'Loyalty Reward'
-        },
-        'Occasional': {
-            'base_discount': 15,
-            'max_discount': 25,
-            'min_order_value': 300,
-            'validity_days': 14,
-            'campaign_type': 'Comeback Offer'
-        },
-        'Lapsed': {
-            'base_discount': 30,
-            'max_discount': 50,
-            'min_order_value': 200,
-            'validity_days': 45,
-            'campaign_type': 'We Miss You!'
-        },
-        'New': {
-            'base_discount': 20,
-            'max_discount': 35,
-            'min_order_value': 200,
-            'validity_days': 30,
-            'campaign_type': 'Welcome Offer'
-        }
-    }
+    return assemble(df, discount_columns(df))
+
+def build_messages(df):
+    """
+    Build the personalized campaign message for each customer.
+    
+    Args:
+        df (pd.DataFrame): DataFrame with segment and discount columns
+        
+    Returns:
+        pd.Series: One message per row
+    """
+    if 'customer_name' in df.columns:
+        names = df['customer_name'].map(str)
+    else:
+        names = pd.Series('Valued Customer', index=df.index)
     
-    # Make a copy of the DataFrame
-    df = df.copy()
+    codes = (
+        df['campaign_type'].str.upper().str.replace(' ', '').str[:4]
+        + pd.Series(np.random.randint(1000, 9999, size=len(df)), index=df.index).astype(str)
+    )
     
-    # Initialize discount columns
-    df['discount_pct'] = 0.0
-    df['min_order_value'] = 0.0
-    df['validity_days'] = 0
-    df['campaign_type'] = ''
+    return (
+        "Hi " + names + ", "
+        + "as a " + df['segment'].map(str) + " customer, we're offering you "
+        + df['discount_pct'].astype(int).astype(str) + "% off "
+        + "your next order of ₹" + df['min_order_value'].astype(int).astype(str) + " or more! "
+        + "Valid for " + df['validity_days'].astype(str) + " days. "
+        + "Use code: " + codes
+    )
+
+def optimize_discounts(df, budget=None, segment_budgets=None, response_scale=20.0, curve_points=200):
+    """
+    Re-assign discount levels to maximize expected value within a campaign budget.
     
-    # Apply discount rules based on segment
-    for segment, rules in discount_rules.items():
-        mask = df['segment'] == segment
-        
-        # Base discount for the segment
-        df.loc[mask, 'discount_pct'] = rules['base_discount']
-        
-        # Apply personalization based on spending
-        if segment in ['VIP', 'Regular']:
-            # Higher spenders get higher discounts (capped at max_discount)
-            df.loc[mask, 'discount_pct'] = df.loc[mask].apply(
-                lambda row: min(
-                    rules['base_discount'] + int(row['total_spent'] / 1000),
-                    rules['max_discount']
-                ),
-                axis=1
-            )
+    Every customer starts at their segment's base_discount and can be raised in
+    1% steps up to max_discount. Campaign cost follows the dashboard estimate
+    (total_spent * discount_pct / 100). Expected value of an offer is the
+    customer's average order value times a redemption probability of
+    1 - exp(-discount_pct / response_scale), so each extra step is worth less
+    than the previous one and a greedy pass over steps sorted by value per
+    rupee is optimal for the relaxed problem.
+    
+    Args:
+        df (pd.DataFrame): Output of generate_discounts
+        budget (float, optional): Overall campaign budget in ₹ (None = no cap)
+        segment_budgets (dict, optional): Budget in ₹ per segment name
+        response_scale (float): Discount % at which redemption reaches ~63%
+        curve_points (int): Maximum number of rows in the returned cost curve
         
-        # Set other campaign parameters
-        df.loc[mask, 'min_order_value'] = rules['min_order_value']
-        df.loc[mask, 'validity_days'] = rules['validity_days']
-        df.loc[mask, 'campaign_type'] = rules['campaign_type']
+    Returns:
+        tuple: (DataFrame with optimized discounts, marginal cost curve DataFrame)
+    """
+    segment_budgets = segment_budgets or {}
     
-    # Ensure discount doesn't exceed 50% and maintains at least 15% margin
-    df['discount_pct'] = df['discount_pct'].clip(upper=50)
+    spent = df['total_spent'].to_numpy(dtype=float)
+    orders = np.maximum(df['total_orders'].to_numpy(dtype=float), 1)
+    avg_order_value = spent / orders
     
-    # Add a personalized message
-    df['message'] = df.apply(
-        lambda row: (
-            f"Hi {row.get('customer_name', 'Valued Customer')}, "
-            f"as a {row['segment']} customer, we're offering you {int(row['discount_pct'])}% off "
-            f"your next order of ₹{int(row['min_order_value'])} or more! "
-            f"Valid for {row['validity_days']} days. "
-            "Use code: "
-            f"{row['campaign_type'].upper().replace(' ', '')[:4]}{np.random.randint(1000, 9999)}"
-        ),
-        axis=1
+    # Floor and ceiling per customer; unknown segments keep their current discount
+    base = df['segment'].map({s: r['base_discount'] for s, r in DISCOUNT_RULES.items()})
+    ceiling = df['segment'].map({s: min(r['max_discount'], 50) for s, r in DISCOUNT_RULES.items()})
+    base = base.fillna(df['discount_pct']).to_numpy(dtype=float)
+    ceiling = ceiling.fillna(df['discount_pct']).to_numpy(dtype=float)
+    n_steps = np.maximum(ceiling - base, 0).astype(np.int64)
+    
+    # Base discounts are committed spend
+    base_cost = spent * base / 100
+    remaining = np.inf if budget is None else budget - base_cost.sum()
+    if remaining < 0:
+        raise ValueError(
+            f"Budget ₹{budget:,.2f} is below the base discount cost of ₹{base_cost.sum():,.2f}"
+        )
+    
+    segment_codes, segment_names = pd.factorize(df['segment'])
+    segment_remaining = np.full(len(segment_names), np.inf)
+    for i, name in enumerate(segment_names):
+        if name in segment_budgets:
+            segment_remaining[i] = segment_budgets[name] - base_cost[segment_codes == i].sum()
+            if segment_remaining[i] < 0:
+                raise ValueError(
+                    f"Budget ₹{segment_budgets[name]:,.2f} for segment '{name}' is below "
+                    f"its base discount cost of ₹{base_cost[segment_codes == i].sum():,.2f}"
+                )
+    
+    # One entry per (customer, 1% step) above the base discount
+    customer = np.repeat(np.arange(len(df)), n_steps)
+    offsets = np.repeat(np.cumsum(n_steps) - n_steps, n_steps)
+    level = base[customer] + (np.arange(len(customer)) - offsets)
+    
+    step_value = avg_order_value[customer] * (
+        np.exp(-level / response_scale) - np.exp(-(level + 1) / response_scale)
     )
+    step_cost = spent[customer] / 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(step_cost > 0, step_value / step_cost, np.where(step_value > 0, np.inf, 0.0))
+    
+    # Steps of one customer have strictly decreasing ratios, so any prefix of
+    # the sorted steps is contiguous from each customer's base discount
+    order = np.argsort(-ratio)
+    step_cost = step_cost[order]
+    step_value = step_value[order]
+    step_segment = segment_codes[customer[order]]
+    
+    # Steps that add no value (customers without spend) are never worth taking
+    accepted = step_value > 0
+    for i in np.flatnonzero(np.isfinite(segment_remaining)):
+        in_segment = step_segment == i
+        accepted[in_segment] = np.cumsum(step_cost[in_segment]) <= segment_remaining[i]
+    
+    candidate = np.flatnonzero(accepted)
+    cumulative_cost = np.cumsum(step_cost[candidate])
+    within_budget = cumulative_cost <= remaining
+    
+    steps_taken = np.bincount(customer[order[candidate[within_budget]]], minlength=len(df))
+    columns = {'discount_pct': base + steps_taken}
+    columns['message'] = build_messages(assemble(df, columns))
+    
+    # Marginal cost curve over every step the segment budgets allow
+    base_value = (avg_order_value * (1 - np.exp(-base / response_scale))).sum()
+    points = np.unique(np.linspace(0, len(candidate) - 1, min(curve_points, len(candidate))).astype(int))
+    curve = pd.DataFrame({
+        'campaign_cost': base_cost.sum() + cumulative_cost[points],
+        'expected_value': base_value + np.cumsum(step_value[candidate])[points],
+        'value_per_rupee': ratio[order[candidate[points]]],
+        'within_budget': within_budget[points]
+    })
+    
+    return assemble(df, columns), curve
+
+def process_customers(df, budget=None, as_of=None, chunk_size=50000, progress=None):
+    """
+    Run segmentation, discount generation and optional budget optimization.
+    
+    Rows are processed in chunks so long runs can report progress and be
+    cancelled between chunks.
+    
+    Args:
+        df (pd.DataFrame): Customer data from load_excel_data
+        budget (float, optional): Campaign budget in ₹ for optimize_discounts
+        as_of (datetime, optional): Reference date for recency (defaults to now)
+        chunk_size (int): Rows per chunk
+        progress (callable, optional): Called as progress(stage, rows_done, total_rows);
+            may raise to abort the run
+        
+    Returns:
+        tuple: (DataFrame with discount recommendations, cost curve or None)
+    """
+    as_of = as_of or datetime.now()
+    total = len(df)
+    report = progress or (lambda stage, done, total_rows: None)
+    
+    def run_stage(stage, frame, fn):
+        """Run a column-returning stage chunk by chunk and join its columns"""
+        report(stage, 0, total)
+        parts = []
+        for start in range(0, total, chunk_size):
+            parts.append(fn(frame.iloc[start:start + chunk_size]))
+            report(stage, min(start + chunk_size, total), total)
+        if not parts:
+            return fn(frame)
+        return {
+            name: pd.concat([part[name] for part in parts]) if isinstance(parts[0][name], pd.Series)
+            else np.concatenate([part[name] for part in parts])
+            for name in parts[0]
+        }
+    
+    # Each stage reads its input and adds columns; the input is never copied
+    df_segmented = assemble(df, run_stage('segmentation', df, lambda chunk: segment_columns(chunk, as_of)))
+    df_with_discounts = assemble(df_segmented, run_stage('discounts', df_segmented, discount_columns))
+    
+    cost_curve = None
+    if budget:
+        report('optimization', 0, total)
+        df_with_discounts, cost_curve = optimize_discounts(df_with_discounts, budget=budget)
+        report('optimization', total, total)
     
-    return df
+    return df_with_discounts, cost_curve
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation has been requested"""
+
+class Job:
+    """
+    State of one background job.
+
+    The job function receives the Job as its `progress` callback:
+    calling job(stage, rows_done, total_rows) records progress and raises
+    JobCancelled once cancel() has been called.
+    """
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'queued'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, stage, rows_done, total_rows):
+        with self._lock:
+            self.progress[stage] = (rows_done, total_rows)
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def snapshot(self):
+        """Return a copy of the per-stage progress safe to read from another thread"""
+        with self._lock:
+            return dict(self.progress)
+
+class JobManager:
+    """
+    Run functions on a shared thread pool and track them by job id.
+
+    One manager is meant to be shared by every session of the app, so jobs
+    from different users run side by side without blocking each other's UI.
+    Finished jobs are dropped `ttl` seconds after they end, so results of
+    sessions that never collect them do not stay in memory.
+    """
+
+    def __init__(self, max_workers=4, ttl=3600):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='discount-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.ttl = timedelta(seconds=ttl)
+
+    def _evict_expired(self):
+        """Drop finished jobs older than the TTL; call with the lock held"""
+        cutoff = datetime.now() - self.ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at <= cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, progress=job, **kwargs) and return its job id.
+        """
+        job = Job(uuid.uuid4().hex[:12])
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        if job._cancel.is_set():
+            job.status = 'cancelled'
+            job.finished_at = datetime.now()
+            return
+
+        job.status = 'running'
+        try:
+            job.result = fn(*args, progress=job, **kwargs)
+            job.status = 'done'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = f"{e}\n{traceback.format_exc()}"
+            job.status = 'failed'
+        finally:
+            job.finished_at = datetime.now()
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def forget(self, job_id):
+        """Drop a finished job and return it"""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
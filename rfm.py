@@ -0,0 +1,218 @@
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from discount_engine import feature_columns
+
+class QuantileSketch:
+    """
+    Mergeable approximate quantile sketch for non-negative values.
+
+    Values are counted in logarithmic buckets (gamma**(i-1), gamma**i], so
+    memory grows only with the log of the value range. A quantile is
+    returned as the upper bound of its bucket: never below the true value,
+    at most `relative_accuracy` above it, and exact for the value 1. Tied
+    values therefore sit on or below their bin edge. Updating never sorts
+    the data, and sketches built on separate chunks or files can be merged.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = 1 + relative_accuracy
+        self._log_gamma = math.log(self.gamma)
+        self.zero_count = 0
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def count(self):
+        return self.zero_count + int(self.counts.sum())
+
+    def _grow(self, low, high):
+        """Make room for bucket indexes low..high"""
+        if len(self.counts) == 0:
+            self.offset = low
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            return
+        new_low = min(low, self.offset)
+        new_high = max(high, self.offset + len(self.counts) - 1)
+        if new_low == self.offset and new_high == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(new_high - new_low + 1, dtype=np.int64)
+        counts[self.offset - new_low:self.offset - new_low + len(self.counts)] = self.counts
+        self.offset = new_low
+        self.counts = counts
+
+    def update(self, values):
+        """Add an array of values; NaN and negative values are ignored"""
+        values = np.asarray(values, dtype=float)
+        values = values[values >= 0]
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        if len(positive) == 0:
+            return self
+
+        index = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+        low, high = int(index.min()), int(index.max())
+        self._grow(low, high)
+        self.counts += np.bincount(index - self.offset, minlength=len(self.counts))[:len(self.counts)]
+        return self
+
+    def merge(self, other):
+        """Add the counts of another sketch with the same accuracy"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.zero_count += other.zero_count
+        if len(other.counts):
+            self._grow(other.offset, other.offset + len(other.counts) - 1)
+            start = other.offset - self.offset
+            self.counts[start:start + len(other.counts)] += other.counts
+        return self
+
+    def quantiles(self, qs):
+        """
+        Approximate quantiles.
+
+        Args:
+            qs: Quantile levels between 0 and 1
+
+        Returns:
+            np.ndarray: One value per level (NaN if the sketch is empty)
+        """
+        qs = np.asarray(qs, dtype=float)
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+
+        rank = qs * (self.count - 1)
+        cumulative = self.zero_count + np.cumsum(self.counts)
+        bucket = np.searchsorted(cumulative, rank, side='right')
+        bucket = np.minimum(bucket, len(self.counts) - 1)
+        # Upper bound of each bucket, so bin edges never fall just below a value
+        values = self.gamma ** (bucket + self.offset)
+        return np.where(rank < self.zero_count, 0.0, values)
+
+class RFMScorer:
+    """
+    Recency, frequency and monetary scoring with per-outlet quantile bins.
+
+    Feed the scorer one or more chunks with update(), then score() any frame.
+    Bins come from quantile sketches, so chunked and multi-file inputs never
+    need to be concatenated or sorted. Scores run from 1 (worst) to n_bins
+    (best); for recency, more recent customers score higher.
+
+    Load multi-outlet data with by_outlet=True (see load_excel_files) so
+    each row holds one outlet's spend; rows merged across outlets keep only
+    the first outlet and would be binned with the combined spend.
+    """
+
+    METRICS = ('recency', 'frequency', 'monetary')
+
+    def __init__(self, n_bins=5, outlet_column='outlet', as_of=None, relative_accuracy=0.01):
+        self.n_bins = n_bins
+        self.outlet_column = outlet_column
+        self.as_of = as_of or datetime.now()
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {}
+
+    def _features(self, df):
+        """Return (outlet labels, {metric: values}) for a frame"""
+        features = feature_columns(df, self.as_of)
+        if self.outlet_column in df.columns:
+            outlets = df[self.outlet_column].fillna('Unknown').astype(str).to_numpy()
+        else:
+            outlets = np.full(len(df), 'All', dtype=object)
+        metrics = {
+            'recency': np.maximum(features['days_since_last_order'].to_numpy(dtype=float), 0),
+            'frequency': features['total_orders'].to_numpy(dtype=float),
+            'monetary': features['total_spent'].to_numpy(dtype=float)
+        }
+        return outlets, metrics
+
+    def update(self, df):
+        """Add a chunk of customers to the per-outlet sketches"""
+        outlets, metrics = self._features(df)
+        for outlet in pd.unique(outlets):
+            mask = outlets == outlet
+            sketches = self.sketches.setdefault(outlet, {
+                metric: QuantileSketch(self.relative_accuracy) for metric in self.METRICS
+            })
+            for metric in self.METRICS:
+                sketches[metric].update(metrics[metric][mask])
+        return self
+
+    def merge(self, other):
+        """Combine sketches built by another scorer, e.g. on another file"""
+        for outlet, sketches in other.sketches.items():
+            if outlet not in self.sketches:
+                self.sketches[outlet] = {metric: QuantileSketch(self.relative_accuracy) for metric in self.METRICS}
+            for metric in self.METRICS:
+                self.sketches[outlet][metric].merge(sketches[metric])
+        return self
+
+    def cutpoints(self):
+        """
+        Bin edges per outlet and metric.
+
+        Returns:
+            pd.DataFrame: One row per (outlet, metric) with n_bins - 1 edges
+        """
+        levels = np.arange(1, self.n_bins) / self.n_bins
+        rows = {
+            (outlet, metric): sketches[metric].quantiles(levels)
+            for outlet, sketches in self.sketches.items()
+            for metric in self.METRICS
+        }
+        return pd.DataFrame.from_dict(rows, orient='index', columns=[f'q{int(l * 100)}' for l in levels])
+
+    def score(self, df):
+        """
+        Score customers against the bins learned so far.
+
+        Args:
+            df: Customer data in the shape load_excel_data produces
+
+        Returns:
+            pd.DataFrame: recency_score, frequency_score, monetary_score and
+            the combined rfm_score (e.g. '545'), aligned to df's index
+        """
+        outlets, metrics = self._features(df)
+        levels = np.arange(1, self.n_bins) / self.n_bins
+        scores = {metric: np.zeros(len(df), dtype=np.int64) for metric in self.METRICS}
+
+        for outlet in pd.unique(outlets):
+            if outlet not in self.sketches:
+                raise ValueError(f"No RFM bins for outlet '{outlet}'; call update() with its data first")
+            mask = outlets == outlet
+            for metric in self.METRICS:
+                edges = self.sketches[outlet][metric].quantiles(levels)
+                # Values equal to an edge, and so all ties, go to the lower bin
+                scores[metric][mask] = np.searchsorted(edges, metrics[metric][mask], side='left') + 1
+
+        # Fewer days since the last order is better
+        scores['recency'] = self.n_bins + 1 - scores['recency']
+
+        result = pd.DataFrame({f'{metric}_score': scores[metric] for metric in self.METRICS}, index=df.index)
+        result['rfm_score'] = (
+            result['recency_score'].astype(str)
+            + result['frequency_score'].astype(str)
+            + result['monetary_score'].astype(str)
+        )
+        return result
+
+def rfm_scores(df, n_bins=5, outlet_column='outlet', as_of=None):
+    """
+    Score a single frame in one pass.
+
+    Args:
+        df: Customer data in the shape load_excel_data produces
+        n_bins: Number of quantile bins per metric
+        outlet_column: Column holding the outlet name, if any
+        as_of: Reference date for recency (defaults to now)
+
+    Returns:
+        pd.DataFrame: RFM scores aligned to df's index
+    """
+    scorer = RFMScorer(n_bins=n_bins, outlet_column=outlet_column, as_of=as_of)
+    return scorer.update(df).score(df)
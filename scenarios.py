@@ -0,0 +1,99 @@
+import pandas as pd
+import numpy as np
+
+from discount_engine import (
+    DISCOUNT_RULES,
+    SEGMENT_THRESHOLDS,
+    SEGMENTS,
+    assign_segments,
+    compute_discounts,
+    feature_columns,
+)
+
+class ScenarioEngine:
+    """
+    Evaluate threshold and discount variations over cached customer features.
+
+    Column mapping, type coercion and the recency calculation run once when
+    the engine is created. Each scenario is then only a rule config applied to
+    the cached spend, order and recency arrays.
+
+    A scenario config is a dict with optional keys:
+        'thresholds': overrides for SEGMENT_THRESHOLDS, e.g. {'vip_spent': 4000}
+        'discount_rules': per-segment overrides for DISCOUNT_RULES,
+            e.g. {'VIP': {'base_discount': 20}}
+    """
+
+    def __init__(self, df, as_of=None):
+        features = feature_columns(df, as_of)
+        self.spent = features['total_spent'].to_numpy(dtype=float)
+        self.orders = features['total_orders'].to_numpy(dtype=float)
+        self.days = features['days_since_last_order'].to_numpy(dtype=float)
+
+    def evaluate(self, scenario=None):
+        """
+        Evaluate a single scenario.
+
+        Args:
+            scenario (dict, optional): Scenario config (None = current rules)
+
+        Returns:
+            dict: Segment codes, discount arrays and total campaign cost
+
+        Raises:
+            ValueError: If the scenario has an unknown key or names an unknown
+                threshold, segment or discount rule
+        """
+        scenario = scenario or {}
+
+        # A typo would otherwise silently evaluate the current rules
+        unknown = sorted(set(scenario) - {'thresholds', 'discount_rules'})
+        if unknown:
+            raise ValueError(f"Unknown scenario keys: {', '.join(unknown)}. Valid keys: thresholds, discount_rules")
+        threshold_overrides = scenario.get('thresholds', {})
+        rule_overrides = scenario.get('discount_rules', {})
+
+        unknown = sorted(set(threshold_overrides) - set(SEGMENT_THRESHOLDS))
+        if unknown:
+            raise ValueError(f"Unknown thresholds: {', '.join(unknown)}. Valid thresholds: {', '.join(SEGMENT_THRESHOLDS)}")
+        unknown = sorted(set(rule_overrides) - set(DISCOUNT_RULES))
+        if unknown:
+            raise ValueError(f"Unknown segments in discount_rules: {', '.join(unknown)}. Valid segments: {', '.join(DISCOUNT_RULES)}")
+        for segment, overrides in rule_overrides.items():
+            unknown = sorted(set(overrides) - set(DISCOUNT_RULES[segment]))
+            if unknown:
+                raise ValueError(f"Unknown discount rules for {segment}: {', '.join(unknown)}. Valid rules: {', '.join(DISCOUNT_RULES[segment])}")
+
+        thresholds = {**SEGMENT_THRESHOLDS, **threshold_overrides}
+        rules = {
+            segment: {**params, **rule_overrides.get(segment, {})}
+            for segment, params in DISCOUNT_RULES.items()
+        }
+
+        codes = assign_segments(self.spent, self.orders, self.days, thresholds)
+        result = compute_discounts(codes, self.spent, rules)
+        result['codes'] = codes
+        result['campaign_cost'] = (self.spent * result['discount_pct'] / 100).sum()
+        return result
+
+    def compare(self, scenarios, baseline='Baseline'):
+        """
+        Evaluate many scenarios and line them up against the current rules.
+
+        Args:
+            scenarios (dict): Scenario name -> scenario config
+            baseline (str): Row label for the current rules
+
+        Returns:
+            pd.DataFrame: One row per scenario with customer counts per segment,
+            campaign cost and cost delta versus the baseline
+        """
+        rows = {}
+        for name, scenario in {baseline: None, **scenarios}.items():
+            result = self.evaluate(scenario)
+            counts = np.bincount(result['codes'], minlength=len(SEGMENTS))
+            rows[name] = {**dict(zip(SEGMENTS, counts)), 'campaign_cost': result['campaign_cost']}
+
+        comparison = pd.DataFrame.from_dict(rows, orient='index')
+        comparison['cost_delta'] = comparison['campaign_cost'] - comparison.loc[baseline, 'campaign_cost']
+        return comparison.round(2)
@@ -0,0 +1,338 @@
+import argparse
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from utils import deduplicate_customers, extract_invoice_events, normalize_phone
+
+DEFAULT_DB_PATH = 'discount_tool.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    phone TEXT PRIMARY KEY,
+    customer_name TEXT,
+    email TEXT,
+    address TEXT,
+    total_orders INTEGER,
+    total_spent REAL,
+    last_order_date TEXT,
+    segment TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_customers_segment ON customers (segment);
+CREATE INDEX IF NOT EXISTS idx_customers_last_order_date ON customers (last_order_date);
+
+CREATE TABLE IF NOT EXISTS invoices (
+    phone TEXT NOT NULL,
+    outlet TEXT NOT NULL DEFAULT '',
+    invoice_id TEXT NOT NULL,
+    amount REAL,
+    invoice_date TEXT,
+    PRIMARY KEY (phone, outlet, invoice_id)
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_invoice_date ON invoices (invoice_date);
+
+CREATE TABLE IF NOT EXISTS discounts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone TEXT NOT NULL,
+    campaign TEXT,
+    segment TEXT,
+    discount_pct REAL,
+    min_order_value REAL,
+    validity_days INTEGER,
+    campaign_type TEXT,
+    message TEXT,
+    issued_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_discounts_phone ON discounts (phone);
+CREATE INDEX IF NOT EXISTS idx_discounts_campaign ON discounts (campaign);
+"""
+
+# Newer exports replace the customer snapshot; empty fields keep the stored
+# value. Totals of customers with invoices are recomputed by UPDATE_TOTALS.
+UPSERT_CUSTOMER = """
+INSERT INTO customers (phone, customer_name, email, address, total_orders, total_spent, last_order_date, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (phone) DO UPDATE SET
+    customer_name = COALESCE(excluded.customer_name, customers.customer_name),
+    email = COALESCE(excluded.email, customers.email),
+    address = COALESCE(excluded.address, customers.address),
+    total_orders = excluded.total_orders,
+    total_spent = excluded.total_spent,
+    last_order_date = NULLIF(MAX(COALESCE(excluded.last_order_date, ''), COALESCE(customers.last_order_date, '')), ''),
+    updated_at = excluded.updated_at
+"""
+
+# Invoice numbers are only unique within an outlet
+UPSERT_INVOICE = """
+INSERT INTO invoices (phone, outlet, invoice_id, amount, invoice_date)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (phone, outlet, invoice_id) DO UPDATE SET
+    amount = excluded.amount,
+    invoice_date = excluded.invoice_date
+"""
+
+# Exports cover a fixed period, so totals come from the full invoice history
+# rather than from the latest file. When fewer invoices could be priced than
+# the export reports orders, the parsed totals are incomplete and only ever
+# raise the snapshot values.
+UPDATE_TOTALS = """
+UPDATE customers SET
+    total_orders = MAX(COALESCE(total_orders, 0), totals.orders),
+    total_spent = CASE
+        WHEN totals.priced >= COALESCE(total_orders, 0) THEN totals.spent
+        ELSE MAX(COALESCE(total_spent, 0), totals.spent)
+    END,
+    last_order_date = NULLIF(MAX(COALESCE(last_order_date, ''), COALESCE(totals.last_date, '')), '')
+FROM (
+    SELECT phone, COUNT(*) AS orders, COUNT(amount) AS priced,
+           COALESCE(SUM(amount), 0) AS spent, MAX(invoice_date) AS last_date
+    FROM invoices
+    WHERE phone = ?
+) AS totals
+WHERE customers.phone = totals.phone
+"""
+
+def _values(series):
+    """Return a Series as Python objects with NaN/NaT replaced by None"""
+    values = series.astype(object)
+    return values.where(values.notna(), None).tolist()
+
+def _column(df, name):
+    """Return a column for binding, or all None if it is missing"""
+    return _values(df[name]) if name in df.columns else [None] * len(df)
+
+def _timestamps(values):
+    """Format datetimes as sortable ISO strings"""
+    return pd.to_datetime(values, errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+
+class CustomerStore:
+    """
+    Local SQLite store for customers, invoices and issued discounts.
+
+    Customers are keyed on their normalized phone number. Rows without a
+    usable phone number are not stored.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+
+    def _migrate(self):
+        """Bring databases created by older versions up to the current schema"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(invoices)")}
+        if columns and 'outlet' not in columns:
+            # Add outlet to the invoices key; existing rows get no outlet
+            with self.conn:
+                self.conn.execute("ALTER TABLE invoices RENAME TO invoices_old")
+                self.conn.execute("DROP INDEX IF EXISTS idx_invoices_invoice_date")
+            self.conn.executescript(SCHEMA)
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO invoices (phone, invoice_id, amount, invoice_date) "
+                    "SELECT phone, invoice_id, amount, invoice_date FROM invoices_old"
+                )
+                self.conn.execute("DROP TABLE invoices_old")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def upsert_customers(self, df: pd.DataFrame) -> int:
+        """
+        Bulk-upsert the output of load_excel_data, including its invoices.
+
+        Pass rows loaded with by_outlet=True so each invoice is stored under
+        the outlet it was issued at; rows are merged per phone here.
+
+        Customers with invoices get their order count, spend and last order
+        date recomputed from every invoice stored for them, so importing
+        exports for different periods accumulates instead of overwriting.
+        If the invoice column prices fewer orders than the export reports,
+        the export's totals are kept unless the stored invoices exceed them.
+
+        Args:
+            df: DataFrame with at least phone and total_spent columns
+
+        Returns:
+            int: Number of customers written
+        """
+        df = df.assign(phone=normalize_phone(df['phone']))
+        df = df[df['phone'].notna()].reset_index(drop=True)
+        customers = deduplicate_customers(df)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        if 'last_order_date' in customers.columns:
+            last_order = _values(_timestamps(customers['last_order_date']))
+        else:
+            last_order = [None] * len(customers)
+        rows = zip(
+            customers['phone'].tolist(),
+            _column(customers, 'customer_name'),
+            _column(customers, 'email'),
+            _column(customers, 'address'),
+            _column(customers, 'total_orders'),
+            _column(customers, 'total_spent'),
+            last_order,
+            [now] * len(customers)
+        )
+
+        with self.conn:
+            self.conn.executemany(UPSERT_CUSTOMER, rows)
+
+            if 'invoice' in df.columns:
+                events = extract_invoice_events(df)
+                if 'outlet' in df.columns:
+                    outlets = df['outlet'].fillna('').astype(str).to_numpy()[events['customer']].tolist()
+                else:
+                    outlets = [''] * len(events)
+                self.conn.executemany(UPSERT_INVOICE, zip(
+                    events['phone'].tolist(),
+                    outlets,
+                    events['invoice_id'].tolist(),
+                    _column(events, 'amount'),
+                    _values(_timestamps(events['invoice_date']))
+                ))
+                self.conn.executemany(UPDATE_TOTALS, ((phone,) for phone in events['phone'].unique()))
+
+        return len(customers)
+
+    def record_discounts(self, df: pd.DataFrame, campaign=None) -> int:
+        """
+        Store issued discounts and the segment each customer was assigned.
+
+        Args:
+            df: Output of generate_discounts
+            campaign: Campaign name (defaults to a timestamp)
+
+        Returns:
+            int: Number of discounts recorded
+        """
+        df = df.assign(phone=normalize_phone(df['phone']))
+        df = df[df['phone'].notna()].reset_index(drop=True)
+        issued_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        campaign = campaign or f"Campaign {issued_at}"
+
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO discounts (phone, campaign, segment, discount_pct, min_order_value,
+                                       validity_days, campaign_type, message, issued_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                zip(
+                    df['phone'].tolist(),
+                    [campaign] * len(df),
+                    _column(df, 'segment'),
+                    _column(df, 'discount_pct'),
+                    _column(df, 'min_order_value'),
+                    _column(df, 'validity_days'),
+                    _column(df, 'campaign_type'),
+                    _column(df, 'message'),
+                    [issued_at] * len(df)
+                )
+            )
+            self.conn.executemany(
+                "UPDATE customers SET segment = ? WHERE phone = ?",
+                zip(_column(df, 'segment'), df['phone'].tolist())
+            )
+
+        return len(df)
+
+    def load_customers(self, segment=None) -> pd.DataFrame:
+        """
+        Read customers back in the shape load_excel_data produces.
+
+        Args:
+            segment: Only return customers last assigned to this segment
+
+        Returns:
+            pd.DataFrame: Stored customers
+        """
+        query = "SELECT * FROM customers"
+        params = ()
+        if segment is not None:
+            query += " WHERE segment = ?"
+            params = (segment,)
+
+        df = pd.read_sql_query(query, self.conn, params=params)
+        df['last_order_date'] = pd.to_datetime(df['last_order_date'], errors='coerce')
+        return df.drop(columns=['segment', 'updated_at'])
+
+    def segment_counts(self) -> pd.DataFrame:
+        """Customer count and spend per last-assigned segment"""
+        return pd.read_sql_query(
+            """
+            SELECT COALESCE(segment, 'Unsegmented') AS segment,
+                   COUNT(*) AS customers,
+                   SUM(total_spent) AS total_spent
+            FROM customers
+            GROUP BY segment
+            ORDER BY customers DESC
+            """,
+            self.conn
+        )
+
+    def campaign_history(self, phone=None) -> pd.DataFrame:
+        """
+        Issued discounts, newest first.
+
+        Args:
+            phone: Only return discounts issued to this phone number
+
+        Returns:
+            pd.DataFrame: Discount history
+        """
+        query = "SELECT * FROM discounts"
+        params = ()
+        if phone is not None:
+            query += " WHERE phone = ?"
+            params = (normalize_phone(pd.Series([phone]))[0],)
+
+        return pd.read_sql_query(query + " ORDER BY issued_at DESC, id DESC", self.conn, params=params)
+
+    def customer_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local customer store")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Path to the SQLite database")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_cmd = commands.add_parser('import', help="Import customer spend reports")
+    import_cmd.add_argument('files', nargs='+')
+
+    commands.add_parser('segments', help="Show customer counts per segment")
+
+    history_cmd = commands.add_parser('history', help="Show issued discounts")
+    history_cmd.add_argument('--phone')
+
+    args = parser.parse_args()
+
+    with CustomerStore(args.db) as store:
+        if args.command == 'import':
+            from utils import load_excel_files
+            handles = [open(path, 'rb') for path in args.files]
+            try:
+                count = store.upsert_customers(load_excel_files(handles, by_outlet=True))
+            finally:
+                for handle in handles:
+                    handle.close()
+            print(f"Imported {count} customers into {args.db}")
+        elif args.command == 'segments':
+            print(store.segment_counts().to_string(index=False))
+        elif args.command == 'history':
+            print(store.campaign_history(args.phone).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import time
+
+import pandas as pd
+import numpy as np
+
+from cohorts import retention_matrix, interpurchase_gaps, gap_distribution, cohort_analysis
+from jobs import JobManager
+
+def make_events():
+    # Customer 0: Jan, Feb, Apr. Customer 1: Jan only. Customer 2: Feb, Mar (twice in Mar)
+    return pd.DataFrame({
+        'customer': [0, 0, 0, 1, 2, 2, 2],
+        'invoice_date': pd.to_datetime([
+            '2025-01-05', '2025-02-10', '2025-04-01',
+            '2025-01-20',
+            '2025-02-03', '2025-03-01', '2025-03-11'
+        ])
+    })
+
+def test_retention_counts_each_customer_once_per_month():
+    counts = retention_matrix(make_events(), normalize=False)
+    
+    assert list(counts.index) == ['2025-01', '2025-02']
+    assert counts.loc['2025-01', 'cohort_size'] == 2
+    assert counts.loc['2025-01', [0, 1, 2, 3]].tolist() == [2, 1, 0, 1]
+    assert counts.loc['2025-02', [0, 1]].tolist() == [1, 1]
+    # Feb cohort cannot be observed three months later yet
+    assert np.isnan(counts.loc['2025-02', 3])
+
+def test_retention_shares():
+    shares = retention_matrix(make_events())
+    assert shares.loc['2025-01', 1] == 0.5
+    assert shares.loc['2025-02', 1] == 1.0
+
+def test_interpurchase_gaps_stay_within_customer():
+    events = make_events().sample(frac=1, random_state=0)
+    gaps = np.sort(interpurchase_gaps(events))
+    assert gaps.tolist() == [10.0, 26.0, 36.0, 50.0]
+
+def test_gap_distribution_caps_long_gaps():
+    dist = gap_distribution(np.array([1.5, 3, 3, 200]), max_days=30)
+    assert dist['orders'].sum() == 4
+    assert dist.loc[3, 'orders'] == 2
+    assert dist.loc[30, 'orders'] == 1
+    assert dist['cumulative_share'].iloc[-1] == 1.0
+
+def test_cohort_analysis_from_invoice_column():
+    df = pd.DataFrame({
+        'phone': ['9876543210', '9123456780'],
+        'invoice': [
+            'Invoice ID: 1(Rs.300 - 2025-05-01 12:00:00), Invoice ID: 2(Rs.200 - 2025-06-15 12:00:00)',
+            'Invoice ID: 3(Rs.150 - 2025-06-02 09:00:00)'
+        ]
+    })
+    analysis = cohort_analysis(df)
+    
+    assert analysis['retention_counts']['cohort_size'].tolist() == [1, 1]
+    assert analysis['gap_percentiles']['p50'] == 45.0
+    assert analysis['gaps']['orders'].sum() == 1
+
+def test_cohort_analysis_runs_as_a_job():
+    df = pd.DataFrame({
+        'phone': ['9876543210', '9123456780'],
+        'invoice': ['Invoice ID: 1(Rs.300 - 2025-05-01 12:00:00)', None]
+    })
+    manager = JobManager(max_workers=1)
+    job = manager.get(manager.submit(cohort_analysis, df))
+    deadline = time.time() + 30
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert job.status == 'done'
+    assert job.result['retention_counts']['cohort_size'].tolist() == [1]
+    assert job.snapshot() == {'invoices': (2, 2), 'cohorts': (1, 1)}
+
+def test_no_dated_invoices():
+    events = pd.DataFrame({'customer': [0], 'invoice_date': [pd.NaT]})
+    assert retention_matrix(events).empty
+    assert len(interpurchase_gaps(events)) == 0
@@ -0,0 +1,62 @@
+import pandas as pd
+
+from utils import deduplicate_customers, normalize_phone
+
+def test_normalize_phone():
+    phones = pd.Series(['+91 98765-43210', 9876543210.0, '09876543210', '12345', 'Not Provided'])
+    normalized = normalize_phone(phones)
+
+    assert normalized[:3].tolist() == ['9876543210'] * 3
+    assert normalized[3:].isna().all()
+
+def test_rows_with_same_phone_are_merged():
+    df = pd.DataFrame({
+        'customer_name': ['Asha', None, 'Ravi'],
+        'phone': ['+91 98765 43210', '9876543210', '9123456789'],
+        'address': ['Outlet A', 'Outlet B', None],
+        'total_spent': [300.0, 200.0, 50.0],
+        'total_orders': [2, 1, 1],
+        'last_order_date': pd.to_datetime(['2025-05-01', '2025-06-01', '2025-04-01']),
+        'invoice': ['Invoice ID: 1(Rs.300 - 2025-05-01 12:00:00)', 'Invoice ID: 2(Rs.200 - 2025-06-01 12:00:00)', None]
+    })
+    merged = deduplicate_customers(df)
+
+    assert len(merged) == 2
+    asha = merged.iloc[0]
+    assert asha['customer_name'] == 'Asha'
+    assert asha['phone'] == '9876543210'
+    assert asha['total_spent'] == 500
+    assert asha['total_orders'] == 3
+    assert asha['last_order_date'] == pd.Timestamp('2025-06-01')
+    assert asha['address'] == 'Outlet A Outlet B'
+    assert asha['invoice'].count('Invoice ID:') == 2
+    assert merged.iloc[1]['customer_name'] == 'Ravi'
+
+def test_missing_phones_are_not_merged():
+    df = pd.DataFrame({
+        'customer_name': ['A', 'B'],
+        'phone': ['Not Provided', 'Not Provided'],
+        'total_spent': [10.0, 20.0],
+        'total_orders': [1, 1]
+    })
+    assert len(deduplicate_customers(df)) == 2
+
+def test_large_shared_phone_is_merged_into_one_customer():
+    n = 80000
+    df = pd.DataFrame({
+        'customer_name': ['Walk-in'] * n,
+        'phone': ['9999999999'] * n,
+        'address': ['Counter'] * n,
+        'total_spent': [100.0] * n,
+        'total_orders': [1] * n,
+        'invoice': [f'Invoice ID: {i}(Rs.100 - 2025-05-01 12:00:00)' for i in range(n)]
+    })
+    merged = deduplicate_customers(df)
+
+    assert len(merged) == 1
+    walk_in = merged.iloc[0]
+    assert walk_in['total_spent'] == 100.0 * n
+    assert walk_in['total_orders'] == n
+    assert walk_in['address'] == 'Counter'
+    entries = walk_in['invoice'].split(', ')
+    assert entries == df['invoice'].tolist()
@@ -0,0 +1,382 @@
+"""
+Equivalence checks between the original row-by-row engine and the fast paths.
+
+The reference_* functions below are frozen copies of the original
+implementations (debug output removed, datetime.now() replaced by as_of).
+Do not optimize them: they define the expected behavior. The golden file
+holds the reference output for the bundled sample report; regenerate it
+only for an intended behavior change with:
+
+    python test_equivalence.py --update-golden
+"""
+import io
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+from discount_engine import generate_discounts, process_customers, segment_customers
+from utils import extract_invoice_events, extract_order_info_from_invoice, load_excel_data
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_REPORT = os.path.join(HERE, 'Total_Customer_Spend_Report_2025_06_23_23_55_41.xlsx')
+GOLDEN_FILE = os.path.join(HERE, 'golden_sample_report.csv')
+SAMPLE_AS_OF = datetime(2025, 6, 23, 23, 55, 41)
+GOLDEN_COLUMNS = [
+    'customer_name', 'phone', 'total_orders', 'total_spent', 'last_order_date', 'days_since_last_order',
+    'segment', 'discount_pct', 'min_order_value', 'validity_days', 'campaign_type', 'message'
+]
+SEEDS = [0, 1, 2, 3, 4]
+
+# Reference implementations
+
+def reference_segment_customers(df, as_of):
+    df = df.copy()
+    required_columns = {
+        'total_orders': ['total_orders', 'order_count', 'orders'],
+        'total_spent': ['total_spent', 'amount', 'total_amount', 'total (₹)', 'total (rs)', 'total (inr)'],
+        'last_order_date': ['last_order_date', 'last_order', 'order_date']
+    }
+    column_mapping = {}
+    for std_name, possible_names in required_columns.items():
+        for col in df.columns:
+            if col.lower() in [name.lower() for name in possible_names]:
+                column_mapping[std_name] = col
+                break
+    missing_columns = [col for col in required_columns if col not in column_mapping]
+    if missing_columns:
+        raise ValueError(f"Could not find required columns: {', '.join(missing_columns)}")
+    for std_name, orig_name in column_mapping.items():
+        if std_name != orig_name:
+            df[std_name] = df[orig_name]
+
+    if not pd.api.types.is_numeric_dtype(df['total_orders']):
+        df['total_orders'] = pd.to_numeric(df['total_orders'], errors='coerce')
+    if not pd.api.types.is_numeric_dtype(df['total_spent']):
+        df['total_spent'] = pd.to_numeric(
+            df['total_spent'].astype(str).str.replace(r'[^\d.]', '', regex=True),
+            errors='coerce'
+        )
+    if not pd.api.types.is_datetime64_any_dtype(df['last_order_date']):
+        df['last_order_date'] = pd.to_datetime(df['last_order_date'], errors='coerce')
+
+    df['total_orders'] = df['total_orders'].fillna(1)
+    df['total_spent'] = df['total_spent'].fillna(0)
+    df['last_order_date'] = df['last_order_date'].fillna(as_of)
+    df['days_since_last_order'] = (as_of - df['last_order_date']).dt.days
+
+    df['segment'] = 'New'
+    vip_mask = (
+        (df['total_spent'] >= 5000) |
+        ((df['total_orders'] >= 10) & (df['total_spent'] >= 2000))
+    )
+    df.loc[vip_mask, 'segment'] = 'VIP'
+    regular_mask = (
+        (~vip_mask) &
+        ((df['total_spent'] >= 2000) |
+         ((df['total_orders'] >= 5) & (df['total_spent'] >= 1000)))
+    )
+    df.loc[regular_mask, 'segment'] = 'Regular'
+    occasional_mask = (
+        (~vip_mask & ~regular_mask) &
+        (df['total_spent'] >= 500)
+    )
+    df.loc[occasional_mask, 'segment'] = 'Occasional'
+    lapsed_mask = (
+        (df['days_since_last_order'] >= 14) &
+        (df['total_orders'] > 0) &
+        (df['total_spent'] > 0)
+    )
+    df.loc[lapsed_mask, 'segment'] = 'Lapsed'
+    new_mask = (
+        (df['total_spent'] < 500) &
+        (df['total_orders'] <= 2) &
+        (df['days_since_last_order'] < 14)
+    )
+    df.loc[new_mask, 'segment'] = 'New'
+    return df
+
+def reference_generate_discounts(df):
+    discount_rules = {
+        'VIP': {'base_discount': 25, 'max_discount': 40, 'min_order_value': 500, 'validity_days': 30, 'campaign_type': 'VIP Exclusive'},
+        'Regular': {'base_discount': 20, 'max_discount': 30, 'min_order_value': 400, 'validity_days': 21, 'campaign_type': 'Loyalty Reward'},
+        'Occasional': {'base_discount': 15, 'max_discount': 25, 'min_order_value': 300, 'validity_days': 14, 'campaign_type': 'Comeback Offer'},
+        'Lapsed': {'base_discount': 30, 'max_discount': 50, 'min_order_value': 200, 'validity_days': 45, 'campaign_type': 'We Miss You!'},
+        'New': {'base_discount': 20, 'max_discount': 35, 'min_order_value': 200, 'validity_days': 30, 'campaign_type': 'Welcome Offer'}
+    }
+    df = df.copy()
+    df['discount_pct'] = 0.0
+    df['min_order_value'] = 0.0
+    df['validity_days'] = 0
+    df['campaign_type'] = ''
+
+    for segment, rules in discount_rules.items():
+        mask = df['segment'] == segment
+        df.loc[mask, 'discount_pct'] = rules['base_discount']
+        if segment in ['VIP', 'Regular']:
+            df.loc[mask, 'discount_pct'] = df.loc[mask].apply(
+                lambda row: min(
+                    rules['base_discount'] + int(row['total_spent'] / 1000),
+                    rules['max_discount']
+                ),
+                axis=1
+            )
+        df.loc[mask, 'min_order_value'] = rules['min_order_value']
+        df.loc[mask, 'validity_days'] = rules['validity_days']
+        df.loc[mask, 'campaign_type'] = rules['campaign_type']
+
+    df['discount_pct'] = df['discount_pct'].clip(upper=50)
+    df['message'] = df.apply(
+        lambda row: (
+            f"Hi {row.get('customer_name', 'Valued Customer')}, "
+            f"as a {row['segment']} customer, we're offering you {int(row['discount_pct'])}% off "
+            f"your next order of ₹{int(row['min_order_value'])} or more! "
+            f"Valid for {row['validity_days']} days. "
+            "Use code: "
+            f"{row['campaign_type'].upper().replace(' ', '')[:4]}{np.random.randint(1000, 9999)}"
+        ),
+        axis=1
+    )
+    return df
+
+def reference_extract_order_info_from_invoice(df, as_of):
+    df = df.copy()
+    df['total_orders'] = 1
+    df['last_order_date'] = as_of
+
+    if 'invoice' in df.columns:
+        for idx, row in df.iterrows():
+            invoice_text = str(row['invoice'])
+            invoice_ids = re.findall(r'Invoice ID: ([^,]+)', invoice_text)
+            if invoice_ids:
+                df.at[idx, 'total_orders'] = len(invoice_ids)
+            date_patterns = [
+                r'(\d{4}-\d{2}-\d{2})',
+                r'(\d{2}-\d{2}-\d{4})',
+                r'(\d{2}/\d{2}/\d{4})',
+            ]
+            for pattern in date_patterns:
+                dates = re.findall(pattern, invoice_text)
+                if dates:
+                    try:
+                        if len(dates[0].split('-')[0]) == 4:
+                            last_date = datetime.strptime(dates[-1], '%Y-%m-%d')
+                        else:
+                            last_date = datetime.strptime(dates[-1], '%d-%m-%Y')
+                        df.at[idx, 'last_order_date'] = last_date
+                        break
+                    except ValueError:
+                        continue
+    return df
+
+# Helpers
+
+def frozen_now(as_of):
+    """Patch datetime.now() in utils, which has no as_of parameter"""
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return as_of
+    return mock.patch.object(utils, 'datetime', FrozenDatetime)
+
+def load_sample_report():
+    with frozen_now(SAMPLE_AS_OF):
+        return load_excel_data(SAMPLE_REPORT)
+
+def as_csv_strings(df):
+    """Round-trip through CSV so frames compare exactly as the golden file is stored"""
+    return pd.read_csv(io.StringIO(df[GOLDEN_COLUMNS].to_csv(index=False)), dtype=str, keep_default_na=False)
+
+def random_customers(seed, n=400):
+    """
+    Customer frames that hit every segmentation edge case: missing and
+    future dates, the 14-day boundary to the second, amounts exactly on
+    each threshold, string and unparsable amounts, zero and missing orders.
+    """
+    rng = np.random.default_rng(seed)
+    as_of = datetime(2025, 6, 23, 12, 0) + timedelta(minutes=int(rng.integers(0, 24 * 60)))
+
+    thresholds = [0, 1, 499.99, 500, 999, 1000, 1999.5, 2000, 4999, 5000, 12000]
+    amounts = np.where(rng.random(n) < 0.5, rng.choice(thresholds, n), rng.uniform(0, 8000, n).round(2))
+    amounts = amounts.astype(object)
+    as_text = rng.random(n) < 0.4
+    amounts[as_text] = [f"₹{value:,.2f}" for value in amounts[as_text]]
+    amounts[rng.random(n) < 0.05] = None
+    amounts[rng.random(n) < 0.03] = 'n/a'
+
+    orders = rng.choice([0, 1, 2, 3, 4, 5, 6, 9, 10, 11, 25], n).astype(float)
+    orders[rng.random(n) < 0.05] = np.nan
+
+    days = np.where(rng.random(n) < 0.4, rng.choice([0, 13, 14, 15], n), rng.integers(-3, 120, n))
+    seconds = rng.choice([0, -1, 1, -3600, 3600], n)
+    dates = pd.Series([as_of - timedelta(days=int(d), seconds=int(s)) for d, s in zip(days, seconds)])
+    dates[rng.random(n) < 0.05] = pd.NaT
+
+    names = pd.Series([f"Customer {i}" for i in range(n)], dtype=object)
+    names[rng.random(n) < 0.03] = None
+
+    df = pd.DataFrame({
+        'customer_name': names,
+        'phone': [f"9{number:09d}" for number in rng.integers(0, 10 ** 9, n)],
+        'total_orders': orders,
+        'Total (₹)': amounts,
+        'last_order_date': dates
+    })
+    if seed % 2:
+        # Dates as exported text rather than parsed timestamps
+        df['last_order_date'] = df['last_order_date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df, as_of
+
+def random_invoice_entry(rng, when):
+    """
+    One invoice entry in any of the shapes seen in exports: canonical, ID
+    only, DD-MM-YYYY dates, T-separated timestamps, thousands commas and a
+    space after 'Rs.'.
+    """
+    invoice_id = rng.integers(1, 10 ** 8)
+    amount = int(rng.integers(50, 5000))
+    timestamp = str(when)
+    shape = rng.integers(0, 6)
+    if shape == 0:
+        return f"Invoice ID: {invoice_id}"
+    if shape == 1:
+        return f"Invoice ID: {invoice_id}(Rs.{amount} - {when.astype('datetime64[D]').item():%d-%m-%Y})"
+    if shape == 2:
+        return f"Invoice ID: {invoice_id}(Rs.{amount} - {timestamp})"
+    if shape == 3:
+        return f"Invoice ID: {invoice_id}(Rs.{amount:,} - {timestamp.replace('T', ' ')})"
+    if shape == 4:
+        return f"Invoice ID: {invoice_id}(Rs. {amount} - {timestamp.replace('T', ' ')})"
+    return f"Invoice ID: {invoice_id}(Rs.{amount} - {timestamp.replace('T', ' ')})"
+
+def random_invoices(seed, n=200):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2025-01-01T00:00:00')
+    cells = []
+    for _ in range(n):
+        count = rng.integers(0, 6)
+        if count == 0:
+            cells.append(rng.choice([None, '', 'no invoice']))
+            continue
+        times = start + rng.integers(0, 170 * 86400, count).astype('timedelta64[s]')
+        if rng.random() < 0.5:
+            times = np.sort(times)
+        cells.append(', '.join(random_invoice_entry(rng, when) for when in times))
+    return pd.DataFrame({'phone': [f"8{i:09d}" for i in range(n)], 'invoice': cells})
+
+def write_golden():
+    df = load_sample_report()
+    np.random.seed(42)
+    reference = reference_generate_discounts(reference_segment_customers(df, SAMPLE_AS_OF))
+    reference[GOLDEN_COLUMNS].to_csv(GOLDEN_FILE, index=False)
+    print(f"Wrote {len(reference)} rows to {GOLDEN_FILE}")
+
+# Golden outputs
+
+def test_sample_report_matches_golden():
+    golden = pd.read_csv(GOLDEN_FILE, dtype=str, keep_default_na=False)
+    df = load_sample_report()
+
+    np.random.seed(42)
+    reference = reference_generate_discounts(reference_segment_customers(df, SAMPLE_AS_OF))
+    np.random.seed(42)
+    fast, _ = process_customers(df, as_of=SAMPLE_AS_OF)
+
+    pd.testing.assert_frame_equal(as_csv_strings(reference), golden)
+    pd.testing.assert_frame_equal(as_csv_strings(fast), golden)
+
+# Randomized equivalence
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_segments_and_discounts_match_reference(seed):
+    df, as_of = random_customers(seed)
+    before = df.copy()
+
+    np.random.seed(seed)
+    expected = reference_generate_discounts(reference_segment_customers(df, as_of))
+    np.random.seed(seed)
+    result = generate_discounts(segment_customers(df, as_of=as_of))
+
+    pd.testing.assert_frame_equal(result, expected)
+    pd.testing.assert_frame_equal(df, before)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_chunked_pipeline_matches_reference(seed):
+    df, as_of = random_customers(seed)
+
+    np.random.seed(seed)
+    expected = reference_generate_discounts(reference_segment_customers(df, as_of))
+    np.random.seed(seed)
+    result, cost_curve = process_customers(df, as_of=as_of, chunk_size=97)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert cost_curve is None
+
+def test_fourteen_day_boundary():
+    as_of = datetime(2025, 6, 23, 12, 0)
+    df = pd.DataFrame({
+        'total_orders': [1, 1, 1, 1],
+        'total_spent': [100, 100, 100, 0],
+        'last_order_date': [
+            as_of - timedelta(days=14) + timedelta(seconds=1),
+            as_of - timedelta(days=14),
+            as_of - timedelta(days=15),
+            as_of - timedelta(days=30)
+        ]
+    })
+    expected = reference_segment_customers(df, as_of)['segment'].tolist()
+
+    assert segment_customers(df, as_of=as_of)['segment'].tolist() == expected == ['New', 'Lapsed', 'Lapsed', 'New']
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_invoice_parsing_matches_reference(seed):
+    df = random_invoices(seed)
+    as_of = datetime(2025, 6, 23, 23, 55, 41)
+
+    expected = reference_extract_order_info_from_invoice(df, as_of)
+    with frozen_now(as_of):
+        result = extract_order_info_from_invoice(df)
+    pd.testing.assert_frame_equal(result, expected)
+
+    # The event table behind cohorts and the store has one row per entry
+    # the reference counts, and holds the date the reference picked
+    events = extract_invoice_events(df)
+    counts = np.bincount(events['customer'], minlength=len(df))
+    np.testing.assert_array_equal(np.where(counts > 0, counts, 1), expected['total_orders'].to_numpy())
+    dated = pd.to_datetime(expected['last_order_date']) != as_of
+    picked = events.assign(day=events['invoice_date'].dt.normalize()).merge(
+        pd.DataFrame({'customer': np.flatnonzero(dated), 'day': pd.to_datetime(expected['last_order_date'][dated]).to_numpy()})
+    )
+    assert set(picked['customer']) == set(np.flatnonzero(dated))
+
+@pytest.mark.parametrize('invoice', [
+    'Invoice ID: 1, Invoice ID: 2',
+    'Invoice ID: 7(Rs.1,250 - 2025-04-15 18:50:08)',
+    'Invoice ID: 7(Rs. 76 - 2025-04-15 18:50:08)',
+    'Invoice ID: 7(Rs.76 - 15-04-2025)',
+    'Invoice ID: 7(Rs.76 - 2025-04-15T18:50:08)',
+    'Invoice ID: 8(Rs.76 - 2025-05-01 10:00:00), Invoice ID: 7(Rs.76 - 2025-04-15 18:50:08)',
+    'Invoice ID: 7(Rs.76 - 31-02-2025)',
+    'Invoice ID: 7(Rs.76 - 15/04/2025)',
+])
+def test_invoice_edge_cases_match_reference(invoice):
+    df = pd.DataFrame({'phone': ['8000000000'], 'invoice': [invoice]})
+    as_of = datetime(2025, 6, 23, 23, 55, 41)
+
+    expected = reference_extract_order_info_from_invoice(df, as_of)
+    with frozen_now(as_of):
+        result = extract_order_info_from_invoice(df)
+    pd.testing.assert_frame_equal(result, expected)
+    assert len(extract_invoice_events(df)) == expected.loc[0, 'total_orders']
+
+if __name__ == "__main__":
+    if '--update-golden' in sys.argv:
+        write_golden()
+    else:
+        sys.exit(pytest.main([__file__, '-q']))
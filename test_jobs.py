@@ -0,0 +1,61 @@
+import time
+
+from discount_engine import process_customers
+from jobs import JobManager
+
+def wait_for(job, timeout=30):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+def test_process_job_reports_progress_per_stage(make_customers):
+    n = 250
+    df = make_customers(n)
+    manager = JobManager(max_workers=2)
+    job = wait_for(manager.get(manager.submit(process_customers, df, chunk_size=100)))
+
+    assert job.status == 'done'
+    result, curve = job.result
+    assert len(result) == n
+    assert curve is None
+    assert job.snapshot() == {'segmentation': (n, n), 'discounts': (n, n)}
+
+def test_cancel_stops_job_between_chunks():
+    def slow(progress):
+        for done in range(100):
+            progress('work', done, 100)
+            time.sleep(0.01)
+        return 'finished'
+
+    manager = JobManager(max_workers=1)
+    job_id = manager.submit(slow)
+    time.sleep(0.05)
+    manager.cancel(job_id)
+    job = wait_for(manager.get(job_id))
+
+    assert job.status == 'cancelled'
+    assert job.result is None
+
+def test_failed_job_keeps_error():
+    def broken(progress):
+        raise ValueError("bad data")
+
+    manager = JobManager(max_workers=1)
+    job = wait_for(manager.get(manager.submit(broken)))
+
+    assert job.status == 'failed'
+    assert job.error.startswith("bad data")
+    assert manager.forget(job.id) is job
+    assert manager.get(job.id) is None
+
+def test_finished_jobs_expire_after_ttl():
+    manager = JobManager(max_workers=1, ttl=0.2)
+    job = wait_for(manager.get(manager.submit(lambda progress: 'done')))
+    running_id = manager.submit(lambda progress: time.sleep(0.5))
+
+    assert manager.get(job.id) is job
+    time.sleep(0.3)
+    # Only finished jobs expire; the running one is kept
+    assert manager.get(job.id) is None
+    assert manager.get(running_id) is not None
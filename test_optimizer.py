@@ -0,0 +1,59 @@
+import pytest
+
+from discount_engine import DISCOUNT_RULES, generate_discounts, optimize_discounts
+
+@pytest.fixture
+def make_discounts(make_customers):
+    def make(n=500, seed=0):
+        return generate_discounts(make_customers(n, seed, orders=(0, 30), segments=list(DISCOUNT_RULES)))
+    return make
+
+def base_cost(df):
+    base = df['segment'].map({s: r['base_discount'] for s, r in DISCOUNT_RULES.items()})
+    return (df['total_spent'] * base / 100).sum()
+
+def campaign_cost(df):
+    return (df['total_spent'] * df['discount_pct'] / 100).sum()
+
+def test_discounts_stay_within_segment_range(make_discounts):
+    df = make_discounts()
+    optimized, _ = optimize_discounts(df, budget=base_cost(df) * 1.1)
+
+    for segment, rules in DISCOUNT_RULES.items():
+        pct = optimized.loc[optimized['segment'] == segment, 'discount_pct']
+        assert pct.min() >= rules['base_discount']
+        assert pct.max() <= rules['max_discount']
+
+def test_overall_budget_is_respected(make_discounts):
+    df = make_discounts()
+    budget = base_cost(df) * 1.1
+    optimized, curve = optimize_discounts(df, budget=budget)
+
+    assert campaign_cost(optimized) <= budget
+    assert curve['campaign_cost'].is_monotonic_increasing
+    assert curve['value_per_rupee'].is_monotonic_decreasing
+
+def test_segment_budget_is_respected(make_discounts):
+    df = make_discounts()
+    lapsed = df[df['segment'] == 'Lapsed']
+    budget = base_cost(lapsed) * 1.05
+    optimized, _ = optimize_discounts(df, segment_budgets={'Lapsed': budget})
+
+    assert campaign_cost(optimized[optimized['segment'] == 'Lapsed']) <= budget
+    vip = optimized[optimized['segment'] == 'VIP']
+    assert (vip['discount_pct'] == DISCOUNT_RULES['VIP']['max_discount']).all()
+
+def test_budget_below_base_cost_raises(make_discounts):
+    df = make_discounts()
+    with pytest.raises(ValueError):
+        optimize_discounts(df, budget=base_cost(df) / 2)
+
+def test_customers_without_spend_stay_at_base_discount(make_discounts):
+    df = make_discounts()
+    df.loc[df.index[:20], 'total_spent'] = 0.0
+    optimized, curve = optimize_discounts(df, budget=base_cost(df) * 1.1)
+
+    base = optimized['segment'].map({s: r['base_discount'] for s, r in DISCOUNT_RULES.items()})
+    assert (optimized['discount_pct'][:20] == base[:20]).all()
+    assert (optimized['discount_pct'][20:] > base[20:]).any()
+    assert (curve['value_per_rupee'] > 0).all()
@@ -0,0 +1,48 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from discount_engine import (
+    assemble,
+    discount_columns,
+    generate_discounts,
+    process_customers,
+    segment_columns,
+    segment_customers,
+)
+
+AS_OF = datetime(2025, 6, 23)
+
+def mixed_customers():
+    return pd.DataFrame({
+        'customer_name': ['Asha', 'Ravi', 'Meera', 'Guest'],
+        'visits': np.array([3.0, 1.0, 12.0, 1.0]),
+        'total_orders': [3, 1, 12, None],
+        'Total (₹)': ['₹2,500', '300', '6000', None],
+        'last_order_date': pd.to_datetime(['2025-06-20', '2025-03-01', '2025-06-01', None])
+    })
+
+def test_stages_return_only_added_columns():
+    df = mixed_customers()
+    segmented = segment_columns(df, as_of=AS_OF)
+    assert list(segmented) == ['total_orders', 'total_spent', 'last_order_date', 'days_since_last_order', 'segment']
+
+    discounts = discount_columns(assemble(df, segmented))
+    assert list(discounts) == ['discount_pct', 'min_order_value', 'validity_days', 'campaign_type', 'message']
+
+def test_input_is_neither_modified_nor_copied():
+    df = mixed_customers()
+    before = df.copy()
+    result = generate_discounts(segment_customers(df, as_of=AS_OF))
+
+    pd.testing.assert_frame_equal(df, before)
+    assert np.shares_memory(result['visits'].to_numpy(), df['visits'].to_numpy())
+
+def test_chunked_pipeline_matches_stage_by_stage():
+    df = mixed_customers()
+    np.random.seed(0)
+    expected = generate_discounts(segment_customers(df, as_of=AS_OF))
+    np.random.seed(0)
+    result, _ = process_customers(df, as_of=AS_OF, chunk_size=3)
+
+    pd.testing.assert_frame_equal(result, expected)
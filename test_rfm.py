@@ -0,0 +1,106 @@
+import pandas as pd
+import numpy as np
+import pytest
+from datetime import datetime
+
+from rfm import QuantileSketch, RFMScorer, rfm_scores
+from utils import deduplicate_customers, load_excel_data, load_excel_files
+
+AS_OF = datetime(2025, 6, 23)
+
+@pytest.fixture
+def make_outlet_customers(make_customers):
+    def make(n=2000, seed=0):
+        return make_customers(n, seed, orders=(1, 30), days=(0, 120), outlets=['Cafe', 'Fine Dining'])
+    return make
+
+def test_sketch_quantiles_are_within_relative_accuracy():
+    values = np.random.default_rng(0).lognormal(7, 1, size=100_000)
+    sketch = QuantileSketch(relative_accuracy=0.01).update(values)
+    levels = [0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+    exact = np.quantile(values, levels)
+    approx = sketch.quantiles(levels)
+    assert np.all(np.abs(approx - exact) / exact < 0.02)
+
+def test_merged_sketches_match_single_sketch():
+    values = np.random.default_rng(1).gamma(2, 500, size=10_000)
+    values[:100] = 0
+    whole = QuantileSketch().update(values)
+    merged = QuantileSketch().update(values[:3000]).merge(QuantileSketch().update(values[3000:]))
+
+    assert merged.count == whole.count == len(values)
+    assert np.array_equal(merged.quantiles([0, 0.005, 0.5, 1]), whole.quantiles([0, 0.005, 0.5, 1]))
+
+def test_chunked_scoring_matches_single_pass(make_outlet_customers):
+    df = make_outlet_customers()
+    scorer = RFMScorer(as_of=AS_OF)
+    for start in range(0, len(df), 500):
+        scorer.update(df.iloc[start:start + 500])
+
+    pd.testing.assert_frame_equal(scorer.score(df), rfm_scores(df, as_of=AS_OF))
+
+def test_scores_are_per_outlet_and_in_range(make_outlet_customers):
+    df = make_outlet_customers()
+    # Fine dining tickets are ten times larger
+    df.loc[df['outlet'] == 'Fine Dining', 'total_spent'] *= 10
+    scores = rfm_scores(df, as_of=AS_OF)
+
+    for metric in ['recency_score', 'frequency_score', 'monetary_score']:
+        assert scores[metric].between(1, 5).all()
+    # Quantile bins put both outlets on the same scale
+    by_outlet = scores.groupby(df['outlet'])['monetary_score'].mean()
+    assert abs(by_outlet['Cafe'] - by_outlet['Fine Dining']) < 0.2
+
+def test_recent_customers_score_higher(make_outlet_customers):
+    df = make_outlet_customers()
+    scores = rfm_scores(df, as_of=AS_OF)
+    days = (AS_OF - df['last_order_date']).dt.days
+
+    assert scores.loc[days.idxmin(), 'recency_score'] == 5
+    assert scores.loc[days.idxmax(), 'recency_score'] == 1
+
+def test_tied_values_share_the_lowest_possible_bin(make_customers):
+    df = make_customers(5000, days=(0, 120))
+    rng = np.random.default_rng(1)
+    df['total_orders'] = np.where(rng.random(len(df)) < 0.7, 1, rng.integers(2, 30, size=len(df)))
+    scorer = RFMScorer(as_of=AS_OF).update(df)
+    scores = scorer.score(df)
+
+    assert scorer.sketches['All']['frequency'].quantiles([0.2, 0.4, 0.6]).tolist() == [1.0, 1.0, 1.0]
+    single = df['total_orders'] == 1
+    assert (scores.loc[single, 'frequency_score'] == 1).all()
+    assert (scores.loc[~single, 'frequency_score'] > 1).all()
+
+def test_loaded_reports_are_tagged_with_their_outlet():
+    report = 'Total_Customer_Spend_Report_2025_06_23_23_55_41.xlsx'
+    df = load_excel_data(report)
+    assert (df['outlet'] == 'Ahmedabad-Shivam Srivastava -Demo').all()
+
+    tagged = load_excel_files([report], outlets=['Cafe'])
+    assert (tagged['outlet'] == 'Cafe').all()
+    scorer = RFMScorer(as_of=AS_OF).update(tagged)
+    assert list(scorer.sketches) == ['Cafe']
+
+def test_customers_of_two_outlets_are_scored_per_outlet():
+    df = pd.DataFrame({
+        'phone': ['9876543210', '9876543210', '9123456789', '9123456789'],
+        'outlet': ['Cafe', 'Fine Dining', 'Cafe', 'Fine Dining'],
+        'total_spent': [300.0, 9000.0, 200.0, 4000.0],
+        'total_orders': [1, 1, 1, 1],
+        'last_order_date': [AS_OF] * 4
+    })
+
+    by_outlet = deduplicate_customers(df, by_outlet=True)
+    assert by_outlet[['outlet', 'total_spent']].values.tolist() == df[['outlet', 'total_spent']].values.tolist()
+
+    scores = rfm_scores(by_outlet, n_bins=2, as_of=AS_OF)
+    assert scores['monetary_score'].tolist() == [2, 2, 1, 1]
+
+def test_reports_for_two_outlets_keep_one_row_per_outlet():
+    report = 'Total_Customer_Spend_Report_2025_06_23_23_55_41.xlsx'
+    merged = load_excel_files([report, report], outlets=['Cafe', 'Fine Dining'])
+    by_outlet = load_excel_files([report, report], outlets=['Cafe', 'Fine Dining'], by_outlet=True)
+
+    assert len(by_outlet) == 2 * len(merged)
+    assert by_outlet.groupby('outlet')['total_spent'].sum().tolist() == pytest.approx([merged['total_spent'].sum() / 2] * 2)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from datetime import datetime
+
+from discount_engine import segment_customers, generate_discounts
+from scenarios import ScenarioEngine
+
+AS_OF = datetime(2025, 6, 23)
+
+def test_baseline_matches_pipeline(make_customers):
+    df = make_customers()
+    processed = generate_discounts(segment_customers(df, as_of=AS_OF))
+    comparison = ScenarioEngine(df, as_of=AS_OF).compare({})
+
+    counts = processed['segment'].value_counts()
+    for segment, count in counts.items():
+        assert comparison.loc['Baseline', segment] == count
+    expected_cost = (processed['total_spent'] * processed['discount_pct'] / 100).sum()
+    assert np.isclose(comparison.loc['Baseline', 'campaign_cost'], round(expected_cost, 2))
+
+def test_lower_vip_line_moves_customers_up(make_customers):
+    engine = ScenarioEngine(make_customers(), as_of=AS_OF)
+    comparison = engine.compare({
+        'VIP at 4000': {'thresholds': {'vip_spent': 4000}},
+        'Same rules': {}
+    })
+
+    assert comparison.loc['VIP at 4000', 'VIP'] >= comparison.loc['Baseline', 'VIP']
+    assert comparison.loc['VIP at 4000', 'cost_delta'] >= 0
+    assert comparison.loc['Same rules', 'cost_delta'] == 0
+
+def test_discount_override_changes_cost(make_customers):
+    engine = ScenarioEngine(make_customers(), as_of=AS_OF)
+    comparison = engine.compare({'Cheaper lapsed': {'discount_rules': {'Lapsed': {'base_discount': 10}}}})
+
+    assert comparison.loc['Cheaper lapsed', 'Lapsed'] == comparison.loc['Baseline', 'Lapsed']
+    assert comparison.loc['Cheaper lapsed', 'cost_delta'] < 0
+
+@pytest.mark.parametrize('scenario, message', [
+    ({'threshold': {'vip_spent': 4000}}, 'Unknown scenario keys: threshold'),
+    ({'thresholds': {'vip_spend': 4000}}, 'Unknown thresholds: vip_spend'),
+    ({'discount_rules': {'Gold': {'base_discount': 30}}}, 'Unknown segments in discount_rules: Gold'),
+    ({'discount_rules': {'VIP': {'base_discont': 30}}}, 'Unknown discount rules for VIP: base_discont'),
+])
+def test_unknown_overrides_are_rejected(make_customers, scenario, message):
+    engine = ScenarioEngine(make_customers(), as_of=AS_OF)
+    with pytest.raises(ValueError, match=message):
+        engine.compare({'Typo': scenario})
@@ -0,0 +1,137 @@
+import sqlite3
+
+import pandas as pd
+
+from discount_engine import segment_customers, generate_discounts
+from store import CustomerStore
+
+def sample_export():
+    return pd.DataFrame({
+        'customer_name': ['Asha', 'Ravi', 'Guest'],
+        'phone': ['+91 98765 43210', '9123456789', 'Not Provided'],
+        'total_spent': [6000.0, 300.0, 50.0],
+        'total_orders': [2, 1, 1],
+        'last_order_date': pd.to_datetime(['2025-05-01', '2025-06-20', '2025-06-01']),
+        'invoice': [
+            'Invoice ID: 1(Rs.2500 - 2025-04-01 12:00:00), Invoice ID: 2(Rs.3500 - 2025-05-01 13:30:00)',
+            'Invoice ID: 3(Rs.300 - 2025-06-20 19:00:00)',
+            None
+        ]
+    })
+
+def test_upsert_and_reload(tmp_path):
+    with CustomerStore(tmp_path / 'store.db') as store:
+        assert store.upsert_customers(sample_export()) == 2
+        assert store.conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0] == 3
+
+        # Re-importing the same export updates in place without double counting
+        newer = sample_export()
+        newer.loc[0, 'customer_name'] = 'Asha K'
+        store.upsert_customers(newer)
+
+        customers = store.load_customers().set_index('phone')
+        assert len(customers) == 2
+        assert customers.loc['9876543210', 'customer_name'] == 'Asha K'
+        assert customers.loc['9876543210', 'total_spent'] == 6000.0
+        assert customers.loc['9876543210', 'total_orders'] == 2
+        assert customers.loc['9876543210', 'last_order_date'] == pd.Timestamp('2025-05-01 13:30:00')
+
+def test_exports_for_different_periods_accumulate(tmp_path):
+    january_to_june = pd.DataFrame({
+        'customer_name': ['Asha'],
+        'phone': ['9876543210'],
+        'total_spent': [6000.0],
+        'total_orders': [2],
+        'invoice': ['Invoice ID: 1(Rs.2500 - 2025-04-01 12:00:00), Invoice ID: 2(Rs.3500 - 2025-05-01 13:30:00)']
+    })
+    july_to_december = pd.DataFrame({
+        'customer_name': ['Asha'],
+        'phone': ['9876543210'],
+        'total_spent': [400.0],
+        'total_orders': [1],
+        'invoice': ['Invoice ID: 9(Rs.400 - 2025-08-15 20:00:00)']
+    })
+
+    with CustomerStore(tmp_path / 'store.db') as store:
+        store.upsert_customers(january_to_june)
+        store.upsert_customers(july_to_december)
+        customer = store.load_customers().iloc[0]
+
+    assert customer['total_spent'] == 6400.0
+    assert customer['total_orders'] == 3
+    assert customer['last_order_date'] == pd.Timestamp('2025-08-15 20:00:00')
+
+def test_indexes_exist(tmp_path):
+    with CustomerStore(tmp_path / 'store.db') as store:
+        indexes = {row[0] for row in store.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'idx_customers_segment', 'idx_customers_last_order_date', 'idx_discounts_phone'} <= indexes
+
+def test_record_discounts_and_history(tmp_path):
+    df = sample_export()
+    processed = generate_discounts(segment_customers(df, as_of=pd.Timestamp('2025-06-23')))
+
+    with CustomerStore(tmp_path / 'store.db') as store:
+        store.upsert_customers(df)
+        assert store.record_discounts(processed, campaign='June') == 2
+
+        history = store.campaign_history('98765 43210')
+        assert history['campaign'].tolist() == ['June']
+        assert history['segment'].tolist() == ['Lapsed']
+        assert len(store.load_customers(segment='Lapsed')) == 1
+
+def test_partially_parsed_invoices_keep_export_totals(tmp_path):
+    export = pd.DataFrame({
+        'customer_name': ['Asha'],
+        'phone': ['9876543210'],
+        'total_spent': [1349.0],
+        'total_orders': [3],
+        'invoice': ['Invoice ID: 1(Rs.99 - 2025-04-01 12:00:00), Invoice ID: 2, Invoice ID: 3']
+    })
+
+    with CustomerStore(tmp_path / 'store.db') as store:
+        store.upsert_customers(export)
+        customer = store.load_customers().iloc[0]
+
+    assert customer['total_spent'] == 1349.0
+    assert customer['total_orders'] == 3
+    assert customer['last_order_date'] == pd.Timestamp('2025-04-01 12:00:00')
+
+def test_same_invoice_number_at_two_outlets(tmp_path):
+    by_outlet = pd.DataFrame({
+        'customer_name': ['Asha', 'Asha'],
+        'phone': ['9876543210', '9876543210'],
+        'outlet': ['Cafe', 'Fine Dining'],
+        'total_spent': [300.0, 9000.0],
+        'total_orders': [1, 1],
+        'invoice': ['Invoice ID: 156(Rs.300 - 2025-04-01 12:00:00)', 'Invoice ID: 156(Rs.9000 - 2025-05-01 20:00:00)']
+    })
+
+    with CustomerStore(tmp_path / 'store.db') as store:
+        assert store.upsert_customers(by_outlet) == 1
+        invoices = store.conn.execute("SELECT outlet, amount FROM invoices ORDER BY outlet").fetchall()
+        customer = store.load_customers().iloc[0]
+
+    assert invoices == [('Cafe', 300.0), ('Fine Dining', 9000.0)]
+    assert customer['total_spent'] == 9300.0
+    assert customer['total_orders'] == 2
+
+def test_invoices_without_outlet_are_migrated(tmp_path):
+    path = tmp_path / 'store.db'
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE invoices (
+            phone TEXT NOT NULL,
+            invoice_id TEXT NOT NULL,
+            amount REAL,
+            invoice_date TEXT,
+            PRIMARY KEY (phone, invoice_id)
+        );
+        CREATE INDEX idx_invoices_invoice_date ON invoices (invoice_date);
+        INSERT INTO invoices VALUES ('9876543210', '1', 250.0, '2025-04-01 12:00:00');
+    """)
+    conn.close()
+
+    with CustomerStore(path) as store:
+        rows = store.conn.execute("SELECT phone, outlet, invoice_id, amount FROM invoices").fetchall()
+
+    assert rows == [('9876543210', '', '1', 250.0)]
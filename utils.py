@@ -1,16 +1,19 @@
 import pandas as pd
-import plotly.express as px
+import numpy as np
 import streamlit as st
 from typing import Union, Dict, Any
 import re
 from datetime import datetime
 
-def load_excel_data(uploaded_file) -> pd.DataFrame:
+def load_excel_data(uploaded_file, outlet: str = None, by_outlet: bool = False) -> pd.DataFrame:
     """
     Load and validate the uploaded Excel file.
     
     Args:
         uploaded_file: Uploaded file object from Streamlit
+        outlet: Outlet name for every row. Defaults to the report's
+            'Restaurant Name' header when the file has no outlet column.
+        by_outlet: Keep one row per phone and outlet instead of per phone
         
     Returns:
         pd.DataFrame: Processed DataFrame with standardized column names
@@ -24,7 +27,14 @@ def load_excel_data(uploaded_file) -> pd.DataFrame:
     
     # Handle the specific format of customer spend reports
     # Check if this is a customer spend report format
+    report_outlet = None
     if 'Customer Phone' in str(df.values):
+        # The report header names the restaurant the export belongs to
+        labels = df.iloc[:, 0].astype(str).str.strip()
+        restaurant = df.iloc[:, 1][labels == 'Restaurant Name:'].dropna()
+        if len(restaurant):
+            report_outlet = str(restaurant.iloc[0]).strip()
+        
         # This is a customer spend report, read with skiprows=5
         if hasattr(uploaded_file, 'seek'):
             uploaded_file.seek(0)
@@ -46,7 +56,9 @@ def load_excel_data(uploaded_file) -> pd.DataFrame:
         'total_spent': ['total_spent', 'total_amount', 'amount', 'total spending', 'total spend', 'lifetime value', 'ltv', 'total revenue', 'total (₹)', 'total (rs)', 'total (inr)'],
         'last_order_date': ['last_order_date', 'last_order', 'order_date', 'date of last order', 'last visit', 'most recent order', 'last purchase date'],
         'avg_order_value': ['avg_order_value', 'average_order_value', 'aov', 'average spend', 'avg spend'],
-        'address': ['address', 'customer address', 'location', 'delivery address']
+        'address': ['address', 'customer address', 'location', 'delivery address'],
+        'invoice': ['invoice', 'invoices', 'invoice details'],
+        'outlet': ['outlet', 'outlet name', 'restaurant', 'restaurant name', 'branch']
     }
     
     # Create a mapping of original column names to standardized names
@@ -92,12 +104,157 @@ def load_excel_data(uploaded_file) -> pd.DataFrame:
     if 'last_order_date' not in df.columns:
         df['last_order_date'] = datetime.now()
     
+    # Tag rows with their outlet so RFM bins can be built per outlet
+    if outlet is not None:
+        df['outlet'] = outlet
+    elif 'outlet' not in df.columns and report_outlet:
+        df['outlet'] = report_outlet
+    
+    # Merge rows that belong to the same phone number
+    df = deduplicate_customers(df, by_outlet=by_outlet)
+    
     return df
 
+def load_excel_files(uploaded_files, outlets=None, by_outlet: bool = False) -> pd.DataFrame:
+    """
+    Load several Excel exports and merge customers that appear in more than one.
+    
+    Args:
+        uploaded_files: Iterable of uploaded file objects from Streamlit
+        outlets: Optional outlet name per file (see load_excel_data)
+        by_outlet: Keep one row per customer and outlet
+        
+    Returns:
+        pd.DataFrame: One row per customer (and outlet) across all files
+    """
+    uploaded_files = list(uploaded_files)
+    outlets = outlets or [None] * len(uploaded_files)
+    frames = [
+        load_excel_data(uploaded_file, outlet, by_outlet=by_outlet)
+        for uploaded_file, outlet in zip(uploaded_files, outlets)
+    ]
+    if len(frames) == 1:
+        return frames[0]
+    return deduplicate_customers(pd.concat(frames, ignore_index=True), by_outlet=by_outlet)
+
+def normalize_phone(phones: pd.Series) -> pd.Series:
+    """
+    Reduce phone numbers to their last 10 digits.
+    
+    Country code (+91), trunk prefix (0), spaces, dashes and a trailing '.0'
+    from Excel floats are dropped. Values with fewer than 10 digits become NaN.
+    
+    Args:
+        phones: Series of raw phone values
+        
+    Returns:
+        pd.Series: Normalized phone numbers
+    """
+    digits = (
+        phones.astype(str)
+        .str.replace(r'\.0+$', '', regex=True)
+        .str.replace(r'\D', '', regex=True)
+    )
+    return digits.str[-10:].where(digits.str.len() >= 10)
+
+def _join_by_key(keys: np.ndarray, values: np.ndarray, separator: str) -> pd.Series:
+    """
+    Join string values per key in their original order.
+    
+    Values are sorted by key once and each group is joined with a single
+    str.join over a slice, so the cost stays linear however large a group is.
+    
+    Args:
+        keys: Integer group key per value
+        values: String values
+        separator: Text placed between values of the same key
+        
+    Returns:
+        pd.Series: Joined text indexed by key
+    """
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    values = values[order].tolist()
+    bounds = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1], True])
+    return pd.Series(
+        [separator.join(values[start:end]) for start, end in zip(bounds[:-1], bounds[1:])],
+        index=keys[bounds[:-1]],
+        dtype=object
+    )
+
+def deduplicate_customers(df: pd.DataFrame, by_outlet: bool = False) -> pd.DataFrame:
+    """
+    Merge rows that share a normalized phone number into one customer.
+    
+    Spend and order counts are summed, the latest order date is kept and
+    invoice and address text is concatenated. Other columns keep their first
+    non-empty value. Rows without a usable phone number are left as they are.
+    
+    Args:
+        df: DataFrame with a 'phone' column
+        by_outlet: Only merge rows that also share their outlet, so spend
+            stays attributed to the outlet it was made at
+        
+    Returns:
+        pd.DataFrame: One row per customer, in order of first appearance
+    """
+    df = df.reset_index(drop=True)
+    key = normalize_phone(df['phone'])
+    df['phone'] = key.fillna(df['phone'])
+    if by_outlet and 'outlet' in df.columns:
+        key = key + '\x00' + df['outlet'].astype(str)
+    
+    # Hash the phone keys once; only rows whose phone repeats need the groupby
+    codes, _ = pd.factorize(key)
+    counts = np.bincount(codes + 1)
+    duplicated = (codes >= 0) & (counts[codes + 1] > 1)
+    if not duplicated.any():
+        return df
+    
+    dups = df[duplicated].copy()
+    dups['_position'] = dups.index
+    dup_key = pd.Series(codes[duplicated], index=dups.index)
+    
+    for col in ['total_spent', 'total_orders']:
+        if col in dups.columns and not pd.api.types.is_numeric_dtype(dups[col]):
+            dups[col] = pd.to_numeric(
+                dups[col].astype(str).str.replace(r'[^\d.]', '', regex=True),
+                errors='coerce'
+            )
+    if 'last_order_date' in dups.columns:
+        dups['last_order_date'] = pd.to_datetime(dups['last_order_date'], errors='coerce')
+    
+    aggregations = {col: 'first' for col in dups.columns}
+    aggregations.update({'total_spent': 'sum', 'total_orders': 'sum', 'last_order_date': 'max', '_position': 'min'})
+    aggregations = {col: how for col, how in aggregations.items() if col in dups.columns}
+    
+    grouped = dups.groupby(dup_key, sort=False)
+    merged = grouped.agg(aggregations)
+    
+    # Concatenate invoice lists and distinct addresses per customer
+    for col, separator in [('invoice', ', '), ('address', ' ')]:
+        if col in dups.columns:
+            text = pd.DataFrame({'key': dup_key, col: dups[col].astype(object)}).dropna()
+            text = text[text[col].astype(str).str.strip() != '']
+            if col == 'address':
+                text = text.drop_duplicates()
+            merged[col] = _join_by_key(text['key'].to_numpy(), text[col].astype(str).to_numpy(), separator)
+    
+    if 'avg_order_value' in merged.columns:
+        merged['avg_order_value'] = merged['total_spent'] / merged['total_orders'].where(merged['total_orders'] > 0)
+    
+    unique = df[~duplicated].assign(_position=df.index[~duplicated])
+    result = pd.concat([unique, merged.reset_index(drop=True)], ignore_index=True)
+    return result.sort_values('_position', kind='stable').drop(columns='_position').reset_index(drop=True)
+
 def extract_order_info_from_invoice(df):
     """
     Extract order count and last order date from the Invoice column.
     
+    Every 'Invoice ID:' entry counts as an order, whether or not its amount
+    and date can be read. The last order date is the last YYYY-MM-DD date in
+    the cell, or failing that the last DD-MM-YYYY date.
+    
     Args:
         df: DataFrame with invoice column
         
@@ -111,37 +268,75 @@ def extract_order_info_from_invoice(df):
     df['last_order_date'] = datetime.now()  # Default to current date
     
     if 'invoice' in df.columns:
-        for idx, row in df.iterrows():
-            invoice_text = str(row['invoice'])
-            
-            # Extract order count (number of invoice IDs)
-            invoice_ids = re.findall(r'Invoice ID: ([^,]+)', invoice_text)
-            if invoice_ids:
-                df.at[idx, 'total_orders'] = len(invoice_ids)
-            
-            # Extract last order date from the most recent invoice
-            date_patterns = [
-                r'(\d{4}-\d{2}-\d{2})',  # YYYY-MM-DD
-                r'(\d{2}-\d{2}-\d{4})',  # DD-MM-YYYY
-                r'(\d{2}/\d{2}/\d{4})',  # DD/MM/YYYY
-            ]
-            
-            for pattern in date_patterns:
-                dates = re.findall(pattern, invoice_text)
-                if dates:
-                    try:
-                        # Try to parse the date
-                        if len(dates[0].split('-')[0]) == 4:  # YYYY-MM-DD
-                            last_date = datetime.strptime(dates[-1], '%Y-%m-%d')
-                        else:  # DD-MM-YYYY or DD/MM/YYYY
-                            last_date = datetime.strptime(dates[-1], '%d-%m-%Y')
-                        df.at[idx, 'last_order_date'] = last_date
-                        break
-                    except ValueError:
-                        continue
+        invoices = df['invoice'].dropna().astype(str)
+        
+        # Extract order count (number of invoice IDs)
+        counts = invoices.str.count(r'Invoice ID: [^,]+')
+        counts = counts[counts > 0]
+        df.loc[counts.index, 'total_orders'] = counts.to_numpy()
+        
+        # Extract last order date, trying each date format in turn
+        last_dates = pd.Series(pd.NaT, index=invoices.index, dtype='datetime64[ns]')
+        for pattern, date_format in [(r'\d{4}-\d{2}-\d{2}', '%Y-%m-%d'), (r'\d{2}-\d{2}-\d{4}', '%d-%m-%Y')]:
+            missing = last_dates.isna()
+            found = invoices[missing].str.extract(f'(?s).*({pattern})', expand=False)
+            last_dates[missing] = pd.to_datetime(found, format=date_format, errors='coerce')
+        last_dates = last_dates.dropna()
+        df.loc[last_dates.index, 'last_order_date'] = last_dates.to_numpy()
     
     return df
 
+# One invoice entry, e.g. "Invoice ID: 20241023(Rs.76 - 2025-04-15 18:50:08)".
+# Only the ID is required; the amount may contain thousands commas or a space
+# after "Rs.", and the date may be ISO (with ' ' or 'T' before the time) or
+# DD-MM-YYYY. Parts that cannot be read come back empty.
+INVOICE_PATTERN = (
+    r'Invoice ID: (?=[^,\x00])(?P<invoice_id>[^,(\x00]*?)\s*(?=[,(\x00]|$)'
+    r'(?:\((?:\s*Rs\.?\s*(?P<amount>\d[\d,]*(?:\.\d+)?))?'
+    r'(?:[^)\x00]*?(?P<invoice_date>\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?|\d{2}-\d{2}-\d{4}))?'
+    r'[^)\x00]*\)?)?'
+)
+
+def _parse_invoice_dates(values: pd.Series) -> pd.Series:
+    """Parse ISO and DD-MM-YYYY invoice dates; anything else becomes NaT"""
+    dates = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    day_first = dates.isna() & values.str.match(r'\d{2}-\d{2}-\d{4}$', na=False)
+    dates[day_first] = pd.to_datetime(values[day_first], format='%d-%m-%Y', errors='coerce')
+    return dates
+
+def extract_invoice_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expand the Invoice column into one row per invoice.
+    
+    Every 'Invoice ID:' entry becomes a row, also when its amount or date
+    cannot be read; those fields are then NaN/NaT.
+    
+    Args:
+        df: DataFrame with invoice and phone columns
+        
+    Returns:
+        pd.DataFrame: Columns customer (row position in df), phone,
+        invoice_id, amount and invoice_date
+    """
+    # One regex pass over every cell joined by NUL. Matching the separator
+    # too tells which row each invoice came from.
+    invoices = df['invoice'].reset_index(drop=True).dropna().astype(str)
+    matches = re.findall('(\x00)|' + INVOICE_PATTERN, '\x00'.join(invoices.tolist()))
+    fields = np.array(matches, dtype=object).reshape(-1, 4)
+    is_separator = fields[:, 0] != ''
+    rows = np.cumsum(is_separator)[~is_separator]
+    fields = fields[~is_separator]
+    
+    customer = invoices.index.to_numpy()[rows]
+    amounts = pd.Series(fields[:, 2], dtype=object).str.replace(',', '', regex=False)
+    return pd.DataFrame({
+        'customer': customer,
+        'phone': df['phone'].to_numpy()[customer],
+        'invoice_id': fields[:, 1],
+        'amount': pd.to_numeric(amounts, errors='coerce').to_numpy(),
+        'invoice_date': _parse_invoice_dates(pd.Series(fields[:, 3], dtype=object)).to_numpy()
+    })
+
 def create_charts(df: pd.DataFrame) -> Dict[str, Any]:
     """
     Create visualizations for the dashboard.
@@ -152,6 +347,9 @@ def create_charts(df: pd.DataFrame) -> Dict[str, Any]:
     Returns:
         dict: Dictionary containing Plotly figures
     """
+    # Plotly is slow to import, so load it only when charts are drawn
+    import plotly.express as px
+    
     charts = {}
     
     # Segment distribution pie chart